@@ -2,7 +2,12 @@ from __future__ import annotations
 import typing
 import dataclasses
 import itertools
+import collections
 import functools
+import hashlib
+import pickle
+import pathlib
+import os
 from functools import cached_property
 from contextlib import contextmanager
 
@@ -17,46 +22,168 @@ T = typing.TypeVar("T", bound=Terminal)
 
 
 # TODO: Confusing names, maybe rename
-@dataclasses.dataclass(frozen=True)
 class State(typing.Generic[T]):
+    """
+    An immutable LR situation.
+    
+    States are interned, so equal states are always the same object. This lets them
+    rely on the builtin identity-based hashing and equality, which are much cheaper
+    than hashing the fields, and states are hashed a lot more often than they are created.
+    
+    The interner is supplied by the caller (normally a `VGkBuilder`), rather than being global,
+    so that states never outlive their builder or get shared with the ones for other grammars.
+    States from different interners must not be mixed.
+    """
+    
+    __slots__ = ("rule", "rule_pos", "continuation", "next_item", "next_is_terminal", "_shifted", "_interned")
+    
     rule: Rule[T]
-    rule_pos: int = 0
-    continuation: typing.Tuple[T, ...] = ()
+    rule_pos: int
+    continuation: typing.Tuple[T, ...]
+    # Derived from the above, precomputed since closure and goto check them for every state
+    next_item: BaseSymbol | None
+    next_is_terminal: bool
+    # Filled in by the first `shifted` call
+    _shifted: State[T] | None
+    # The interner this state belongs to, so that shifted states end up in it as well
+    _interned: typing.Dict[typing.Tuple[Rule[T], int, typing.Tuple[T, ...]], State[T]]
     
-    def get_next_item(self) -> BaseSymbol | None:
-        if self.rule_pos == len(self.rule):
-            return None
+    def __new__(cls, rule: Rule[T], rule_pos: int = 0, continuation: typing.Tuple[T, ...] = (),
+                interned: typing.Dict[typing.Tuple[Rule[T], int, typing.Tuple[T, ...]], State[T]] | None = None) -> State[T]:
+        if interned is None:
+            interned = {}
+        
+        key = (rule, rule_pos, continuation)
         
-        return self.rule.rhs[self.rule_pos]
+        state: State[T] | None = interned.get(key)
+        
+        if state is None:
+            state = super().__new__(cls)
+            
+            object.__setattr__(state, "rule", rule)
+            object.__setattr__(state, "rule_pos", rule_pos)
+            object.__setattr__(state, "continuation", continuation)
+            
+            next_item: BaseSymbol | None = rule.rhs[rule_pos] if rule_pos < len(rule) else None
+            
+            object.__setattr__(state, "next_item", next_item)
+            object.__setattr__(state, "next_is_terminal", next_item is not None and next_item.is_terminal())
+            object.__setattr__(state, "_shifted", None)
+            object.__setattr__(state, "_interned", interned)
+            
+            interned[key] = state
+        
+        return state
+    
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot assign to field {name!r}")
+    
+    def __delattr__(self, name: str) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot delete field {name!r}")
+    
+    def __reduce__(self):
+        # Unpickled states couldn't be put back into the interner they came from
+        raise TypeError("LR states are tied to their builder and can't be pickled")
+    
+    def __repr__(self) -> str:
+        return f"State(rule={self.rule!r}, rule_pos={self.rule_pos!r}, continuation={self.continuation!r})"
+    
+    def get_next_item(self) -> BaseSymbol | None:
+        return self.next_item
     
     def shifted(self) -> State[T]:
-        if self.rule_pos == len(self.rule):
-           raise ValueError("Cannot shift a completed state")
+        shifted: State[T] | None = self._shifted
         
-        return dataclasses.replace(self, rule_pos=self.rule_pos + 1)
+        if shifted is None:
+            if self.next_item is None:
+                raise ValueError("Cannot shift a completed state")
+            
+            # Interned states are shifted over and over, so this skips the interner lookup next time
+            shifted = State(self.rule, self.rule_pos + 1, self.continuation, self._interned)
+            object.__setattr__(self, "_shifted", shifted)
+        
+        return shifted
 
 
 class Table(UpdateableSet[State[T]], typing.Generic[T]):
     @staticmethod
-    def initial(start_rule: Rule[T]) -> Table:
-        return Table(new_values={State(start_rule)})
+    def initial(start_state: State[T]) -> Table:
+        return Table(new_values={start_state})
     
     def freeze(self) -> FrozenTable[T]:
+        """
+        Returns an immutable version of this table.
+        
+        The frozen table shares the storage with this one instead of copying it,
+        so this table must not be modified afterwards.
+        """
+        
         assert not self.has_new(), "Table not yet complete"
         
-        return FrozenTable(frozenset(self.values))
+        by_next: typing.Dict[BaseSymbol, typing.List[State[T]]] = {}
+        completed: typing.List[State[T]] = []
+        # Order-independent, like the hash of a frozenset
+        table_hash: int = 0
+        
+        for state in self.values:
+            table_hash ^= hash(state)
+            next_item: BaseSymbol | None = state.next_item
+            
+            if next_item is None:
+                completed.append(state)
+            else:
+                by_next.setdefault(next_item, []).append(state)
+        
+        return FrozenTable(
+            self.values,
+            by_next={symbol: tuple(states) for symbol, states in by_next.items()},
+            completed=tuple(completed),
+            values_hash=table_hash,
+        )
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False)
 class FrozenTable(typing.Generic[T]):
-    values: typing.FrozenSet[State[T]]
-    gotos: typing.Dict[BaseSymbol, FrozenTable[T]] = dataclasses.field(hash=False, compare=False, default_factory=dict)
+    # A read-only view of the states, see `Table.freeze`
+    values: typing.AbstractSet[State[T]]
+    # Indexed by symbol ids assigned by the VGkBuilder, None for missing transitions
+    gotos: typing.List[FrozenTable[T] | None] = dataclasses.field(hash=False, compare=False, default_factory=list)
+    # The non-completed states, grouped by their next item. Fully determined by `values`
+    by_next: typing.Mapping[BaseSymbol, typing.Tuple[State[T], ...]] = dataclasses.field(hash=False, compare=False, default_factory=dict)
+    # The completed states. Also fully determined by `values`
+    completed: typing.Tuple[State[T], ...] = dataclasses.field(hash=False, compare=False, default=())
+    # Computed from `values` if not supplied
+    values_hash: int | None = dataclasses.field(repr=False, default=None)
+    
+    def __post_init__(self) -> None:
+        if self.values_hash is None:
+            object.__setattr__(self, "values_hash", functools.reduce(
+                lambda acc, state: acc ^ hash(state), self.values, 0
+            ))
+    
+    def __hash__(self) -> int:
+        return self.values_hash
+    
+    def __eq__(self, other: typing.Any) -> bool:
+        if self is other:
+            return True
+        
+        if not isinstance(other, FrozenTable):
+            return NotImplemented
+        
+        return self.values_hash == other.values_hash and \
+            len(self.values) == len(other.values) and \
+            self.values == other.values
 
 
 class FirstKProvider(typing.Generic[T]):
     _grammar: typing.Final[Grammar[T]]
     _k: typing.Final[int]
     _symbol_expansion_cache: typing.Dict[BaseSymbol, typing.Set[typing.Tuple[T, ...]]]
+    _sequence_expansion_cache: typing.Dict[typing.Tuple[BaseSymbol, ...], typing.FrozenSet[typing.Tuple[T, ...]]]
+    _suffix_expansion_cache: typing.Dict[typing.Tuple[Rule[T], int], typing.FrozenSet[typing.Tuple[T, ...]]]
+    _continuations_cache: typing.Dict[typing.Tuple[T, ...], typing.Tuple[T, ...]]
+    _prepared: bool
     
     def __init__(self, grammar: Grammar[T], k: int):
         grammar.new_start  # Trigger generation
@@ -67,17 +194,17 @@ class FirstKProvider(typing.Generic[T]):
         self.rules_by_lhs  # Trigger generation
         
         self._symbol_expansion_cache = {}
+        self._sequence_expansion_cache = {}
+        self._suffix_expansion_cache = {}
+        self._continuations_cache = {}
+        self._prepared = False
         
         self._prepare()
     
     @cached_property
-    def rules_by_lhs(self) -> typing.Dict[Nonterminal, typing.List[Rule[T]]]:
-        result: typing.Dict[Nonterminal, typing.List[Rule[T]]] = {}
-        
-        for rule in self._grammar.rules:
-            result.setdefault(rule.lhs, []).append(rule)
-        
-        return result
+    def rules_by_lhs(self) -> typing.Mapping[Nonterminal, typing.Tuple[Rule[T], ...]]:
+        # The grammar is complete by now, so its index can be shared
+        return self._grammar.rules_by_lhs
     
     @property
     def new_start(self) -> Nonterminal[T]:
@@ -88,69 +215,174 @@ class FirstKProvider(typing.Generic[T]):
         return only(self.rules_by_lhs[self.new_start])
     
     @staticmethod
-    def _set_minkovsky_sum(set_a: typing.Set[T], set_b: typing.Set[T]) -> typing.Set[T]:
+    def _set_minkovsky_sum(set_a: typing.Set[T], set_b: typing.Set[T], k: int) -> typing.Set[T]:
         """
-        Compute the Minkovsky sum of the two sets.
+        Compute the Minkovsky sum of the two sets, truncating the results to length k.
         """
         
-        return set(a + b for a, b in itertools.product(set_a, set_b))
-    
-    @cached_property
-    def _sufficient_repetitions(self) -> int:
-        return self._k * len(self._grammar.rules)
+        result: typing.Set[T] = set()
+        
+        if not set_b:
+            # Nothing to continue with, not even the empty string
+            return result
+        
+        for a in set_a:
+            need: int = k - len(a)
+            
+            if need <= 0:
+                # Nothing from set_b would survive the truncation
+                result.add(a[:k])
+                continue
+            
+            # Truncating b first avoids building the long concatenation at all
+            result.update(a + b[:need] for b in set_b)
+        
+        return result
     
     def _prepare(self) -> None:
-        nonterminals = list(self._grammar.nonterminals.values())
+        """
+        Compute the expansions of all nonterminals at once.
+        
+        This is a fixpoint computation over a worklist: a nonterminal is only recomputed
+        when the expansion of some symbol in its rules has grown since.
+        """
+        
+        cache = self._symbol_expansion_cache
+        # used_by[B] is the set of nonterminals that have B in one of their rules
+        used_by: typing.Dict[BaseSymbol, typing.Set[Nonterminal]] = {}
+        
+        for rule in self._grammar.rules:
+            for symbol in rule.rhs:
+                if not symbol.is_terminal():
+                    used_by.setdefault(symbol, set()).add(rule.lhs)
+        
+        for symbol in self._grammar.nonterminals.values():
+            cache.setdefault(symbol, set())
+        
+        worklist: typing.Deque[Nonterminal] = collections.deque(self._grammar.nonterminals.values())
+        queued: typing.Set[Nonterminal] = set(worklist)
         
-        for _ in range(self._sufficient_repetitions):
-            for symbol in nonterminals:
-                self._expand_symbol(symbol, explicit=True)
+        while worklist:
+            symbol = worklist.popleft()
+            queued.discard(symbol)
+            
+            expansion: typing.Set[typing.Tuple[T, ...]] = cache[symbol]
+            new_expansion: typing.Set[typing.Tuple[T, ...]] = self._do_expand_symbol(symbol)
+            
+            if new_expansion <= expansion:
+                continue
+            
+            expansion.update(new_expansion)
+            
+            for user in used_by.get(symbol, ()):
+                if user not in queued:
+                    queued.add(user)
+                    worklist.append(user)
+        
+        # From now on the symbol expansions are final, so sequence expansions may be memoized
+        self._prepared = True
     
-    def _expand_sequence(self, rule_symbols: typing.Iterable[BaseSymbol]) -> typing.Set[typing.Tuple[T, ...]]:
-        result: typing.Set[typing.Tuple[T, ...]] = set()
-        cur_result: typing.Set[typing.Tuple[T, ...]] = {()}
+    def _expand_sequence(self, rule_symbols: typing.Iterable[BaseSymbol]) -> typing.FrozenSet[typing.Tuple[T, ...]]:
+        rule_symbols = tuple(rule_symbols)
         
-        k = self._k
+        if self._prepared and rule_symbols in self._sequence_expansion_cache:
+            return self._sequence_expansion_cache[rule_symbols]
         
         # debug(">>>", "expand_sequence", rule_symbols)
         
+        if self._k == 1:
+            result = self._do_expand_sequence_k1(rule_symbols)
+        else:
+            result = self._do_expand_sequence(rule_symbols)
+        
+        # debug(">>>", "expand_sequence result", result)
+        
+        frozen_result: typing.FrozenSet[typing.Tuple[T, ...]] = frozenset(result)
+        
+        if self._prepared:
+            self._sequence_expansion_cache[rule_symbols] = frozen_result
+        
+        return frozen_result
+    
+    def _do_expand_sequence(self, rule_symbols: typing.Tuple[BaseSymbol, ...]) -> typing.Set[typing.Tuple[T, ...]]:
+        result: typing.Set[typing.Tuple[T, ...]] = set()
+        # Only the incomplete prefixes are ever extended further
+        frontier: typing.Set[typing.Tuple[T, ...]] = {()}
+        
+        # Locals to speed up access
+        k = self._k
+        minkovsky_sum = self._set_minkovsky_sum
+        expand_symbol = self._expand_symbol
+        
         for child_symbol in rule_symbols:
-            cur_result = self._set_minkovsky_sum(cur_result, self._expand_symbol(child_symbol))
+            frontier = minkovsky_sum(frontier, expand_symbol(child_symbol), k)
+            
+            # Already truncated, so these are exactly k long and won't grow any further
+            complete = {r for r in frontier if len(r) == k}
             
-            long_results = set(r for r in cur_result if len(r) >= k)
+            result.update(complete)
+            frontier.difference_update(complete)
             
-            result.update(r[:k] for r in long_results)
-            cur_result.difference_update(long_results)
+            if not frontier:
+                # Every prefix is complete, the rest of the sequence doesn't matter
+                break
         
-        result.update(r[:k] for r in cur_result)
+        result.update(frontier)
         
-        # debug(">>>", "expand_sequence result", result)
+        return result
+    
+    def _do_expand_sequence_k1(self, rule_symbols: typing.Tuple[BaseSymbol, ...]) -> typing.Set[typing.Tuple[T, ...]]:
+        """
+        A specialization of `_do_expand_sequence` for k = 1.
+        
+        Every non-empty expansion is already complete, so no sums are needed at all:
+        the result is just the union of the symbols' expansions up to the first non-nullable one.
+        """
+        
+        result: typing.Set[typing.Tuple[T, ...]] = set()
+        expand_symbol = self._expand_symbol
+        
+        for child_symbol in rule_symbols:
+            expansion = expand_symbol(child_symbol)
+            
+            result.update(expansion)
+            
+            if () not in expansion:
+                # The empty prefix may only have come from the preceding nullable symbols
+                result.discard(())
+                return result
+        
+        # The whole sequence is nullable
+        result.add(())
         
         return result
     
-    def _expand_symbol(self, symbol: BaseSymbol, explicit: bool = False) -> typing.Set[typing.Tuple[T, ...]]:
+    def _expand_symbol(self, symbol: BaseSymbol) -> typing.Set[typing.Tuple[T, ...]]:
         """
         For each symbol, compute the set of all possible continuations of the symbol of length <=k.
+        
+        While the provider is being prepared, this returns the current partial result for nonterminals.
         """
         
         # debug(">>>", f"expand_symbol({symbol})")
         
-        if symbol not in self._symbol_expansion_cache or explicit:
-            result: typing.Set[typing.Tuple[T, ...]] = \
-                self._symbol_expansion_cache.setdefault(symbol, set())
-            
-            for _ in range(self._sufficient_repetitions):
-                result.update(self._do_expand_symbol(symbol))
+        # A single lookup on the hot path
+        result: typing.Set[typing.Tuple[T, ...]] | None = self._symbol_expansion_cache.get(symbol)
+        
+        if result is None:
+            # Only terminals and nonterminals without any rules get here, so there's no fixpoint to reach
+            result = self._symbol_expansion_cache[symbol] = set(self._do_expand_symbol(symbol))
         
-            # debug(">>>", f"expand_symbol({symbol}) result", result)
+        # debug(">>>", f"expand_symbol({symbol}) result", result)
         
-        return self._symbol_expansion_cache[symbol]
+        return result
     
     def _do_expand_symbol(self, symbol: BaseSymbol) -> typing.Set[typing.Tuple[T, ...]]:
         if symbol.is_terminal():
             symbol: Terminal[T]
             
-            return {(symbol.get_token(),)}
+            # Interned, so that for k = 1 the expansions consist of canonical continuations only
+            return {self._intern_continuation((symbol.get_token(),))}
         
         result: typing.Set[typing.Tuple[T, ...]] = set()
         
@@ -166,12 +398,59 @@ class FirstKProvider(typing.Generic[T]):
         
         # debug(">>", "first_k", rule_symbols, continuation)
         
-        result = self._expand_sequence(rule_symbols)
+        return self._append_continuation(self._expand_sequence(rule_symbols), continuation)
+    
+    def first_k_after(self, rule: Rule[T], rule_pos: int, continuation: typing.Tuple[T, ...]) -> typing.Set[typing.Tuple[T, ...]]:
+        """
+        Same as `first_k(rule.rhs[rule_pos:], continuation)`, but avoids hashing the suffix on repeated calls.
+        """
+        
+        assert self._prepared, "Rule suffixes are only memoized once the provider is prepared"
+        
+        key = (rule, rule_pos)
+        
+        expansion: typing.FrozenSet[typing.Tuple[T, ...]] | None = self._suffix_expansion_cache.get(key)
+        
+        if expansion is None:
+            expansion = self._suffix_expansion_cache[key] = self._expand_sequence(rule.suffixes[rule_pos])
+        
+        return self._append_continuation(expansion, continuation)
+    
+    def _append_continuation(self, expansion: typing.Iterable[typing.Tuple[T, ...]], continuation: typing.Tuple[T, ...]) -> typing.Set[typing.Tuple[T, ...]]:
+        """
+        Completes the too short expansions with the continuation, truncating to length k.
+        """
         
         k = self._k
-        result = set(r + continuation[:k - len(r)] for r in result)
+        intern = self._intern_continuation
+        
+        if k == 1:
+            # Non-empty expansions are complete and already interned, see `_do_expand_symbol`,
+            # so only the empty one needs replacing
+            result = set(expansion)
+            
+            if () in result:
+                result.discard(())
+                result.add(intern(continuation[:1]))
+            
+            return result
+        
+        result = set(
+            intern(r if len(r) == k else r + continuation[:k - len(r)])
+            for r in expansion
+        )
         
         return result
+    
+    def _intern_continuation(self, continuation: typing.Tuple[T, ...]) -> typing.Tuple[T, ...]:
+        """
+        Returns the canonical object for the given continuation.
+        
+        There are only so many distinct continuations, while the states holding them are numerous,
+        so this saves memory and lets most comparisons between them succeed on identity alone.
+        """
+        
+        return self._continuations_cache.setdefault(continuation, continuation)
 
 
 class VGkBuilder(typing.Generic[T]):
@@ -180,91 +459,245 @@ class VGkBuilder(typing.Generic[T]):
     """
     
     _first_k_provider: FirstKProvider[T]
+    _symbols: typing.List[BaseSymbol]
+    _symbol_ids: typing.Dict[BaseSymbol, int]
     _tables: UpdateableSet[FrozenTable[T]]
+    _canonical_tables: typing.Dict[FrozenTable[T], FrozenTable[T]]
+    _tables_by_kernel: typing.Dict[typing.FrozenSet[State[T]], FrozenTable[T]]
+    # The interner for this builder's states
+    _states_cache: typing.Dict[typing.Tuple[Rule[T], int, typing.Tuple[T, ...]], State[T]]
+    _lookaheads_cache: typing.Dict[State[T], typing.FrozenSet[typing.Tuple[T, ...]]]
+    _lookahead_sets: typing.Dict[typing.FrozenSet[typing.Tuple[T, ...]], typing.FrozenSet[typing.Tuple[T, ...]]]
+    _closure_cache: typing.Dict[State[T], typing.FrozenSet[State[T]]]
     
     def __init__(self, grammar: Grammar[T], k: int):
         self._first_k_provider = FirstKProvider(grammar, k)
         
+        self._symbol_ids = {}
+        
+        for rule in grammar.rules:
+            for symbol in itertools.chain((rule.lhs,), rule.rhs):
+                self._symbol_ids.setdefault(symbol, len(self._symbol_ids))
+        
+        self._symbols = list(self._symbol_ids.keys())
+        
         self._tables = UpdateableSet()
+        self._canonical_tables = {}
+        self._tables_by_kernel = {}
+        self._states_cache = {}
+        self._lookaheads_cache = {}
+        self._lookahead_sets = {}
+        self._closure_cache = {}
+    
+    def _make_state(self, rule: Rule[T], rule_pos: int = 0, continuation: typing.Tuple[T, ...] = ()) -> State[T]:
+        """
+        Returns the state with the given parameters, interned within this builder.
+        """
+        
+        return State(rule, rule_pos, continuation, self._states_cache)
     
     def _add_table(self, table: Table[T]) -> FrozenTable[T]:
         """
-        Add the closure of the given table to the registry, if it hasn't been seen yet
+        Add the closure of the given table to the registry, if it hasn't been seen yet.
+        
+        Returns the registered table, so that the gotos form a proper graph without duplicate nodes.
         """
         
+        # The closure is fully determined by the kernel, so repeated kernels needn't be completed again.
+        # States are hashed by identity, so this key is a lot cheaper than the completed table
+        kernel: typing.FrozenSet[State[T]] = frozenset(table)
+        
+        registered: FrozenTable[T] | None = self._tables_by_kernel.get(kernel)
+        
+        if registered is not None:
+            return registered
+        
         self._complete_table(table)
         
         frozen_table: FrozenTable[T] = table.freeze()
         
-        if frozen_table not in self._tables:
+        if frozen_table not in self._canonical_tables:
+            self._canonical_tables[frozen_table] = frozen_table
             self._tables.add(frozen_table)
         
-        return frozen_table
+        registered = self._tables_by_kernel[kernel] = self._canonical_tables[frozen_table]
+        
+        return registered
     
     def _complete_table(self, table: Table[T]) -> None:
         """
         Apply the closure operation to the given table.
         """
         
-        while table.has_new():
-            state = table.process()
-            next_item: BaseSymbol | None =  state.get_next_item()
+        # Processed a whole layer at a time with set operations, rather than state by state
+        # Locals to speed up access. The cache is probed inline, since most states hit it
+        closure_children = self._closure_children
+        cached_children = self._closure_cache.get
+        closure: typing.Set[State[T]] = set(table.new_values)
+        layer: typing.Set[State[T]] = closure
+        
+        while layer:
+            children: typing.Set[State[T]] = set()
             
-            if next_item is None or next_item.is_terminal():
-                continue
+            for state in layer:
+                state_children: typing.FrozenSet[State[T]] | None = cached_children(state)
+                
+                if state_children is None:
+                    state_children = closure_children(state)
+                
+                if state_children:
+                    children |= state_children
             
-            next_item: Nonterminal
+            layer = children - closure
+            closure |= layer
         
+        table.add_many(closure)
+        table.process_all()
+    
+    def _closure_children(self, state: State[T]) -> typing.FrozenSet[State[T]]:
+        """
+        Returns the states directly added to a table's closure by the given one.
+        
+        The same states reappear in lots of tables, so the result is cached.
+        """
+        
+        children: typing.FrozenSet[State[T]] | None = self._closure_cache.get(state)
+        
+        if children is not None:
+            return children
+        
+        next_item: BaseSymbol | None = state.next_item
+        
+        if next_item is None or state.next_is_terminal:
+            children = frozenset()
+        else:
+            next_item: Nonterminal
+            
             # debug(">>", "querying", state.rule.rhs[state.rule_pos + 1:], state.continuation)
             
-            continuations: typing.Collection[typing.Tuple[T, ...]] = list(
-                self._first_k(state.rule.rhs[state.rule_pos + 1:], state.continuation)
-            )
-        
+            # The shifted state will most likely be reached through goto as well,
+            # so this also precomputes its lookaheads for the actions table
+            continuations: typing.Collection[typing.Tuple[T, ...]] = \
+                self.lookaheads(state.shifted())
+            
             # debug(">>>", "continuations", continuations)
             
-            for rule in self._rules_by_lhs.get(next_item, ()):
-                for continuation in continuations:
-                    table.add(State(rule, continuation=continuation))
+            make_state = self._make_state
+            
+            children = frozenset(
+                make_state(rule, 0, continuation)
+                for rule in self._rules_by_lhs.get(next_item, ())
+                for continuation in continuations
+            )
+        
+        self._closure_cache[state] = children
+        
+        return children
 
     def _goto(self, table: FrozenTable[T]) -> typing.Mapping[BaseSymbol, Table[T]]:
         """
         Apply the goto operation to the given table, and return the result.
         """
         
-        results: typing.Dict[BaseSymbol, Table[T]] = {}
+        return {
+            next_item: Table(new_values=map(State.shifted, states))
+            for next_item, states in table.by_next.items()
+        }
+    
+    def lookaheads(self, state: State[T]) -> typing.FrozenSet[typing.Tuple[T, ...]]:
+        """
+        Returns the possible first k tokens after the dot in the given state.
         
-        for state in table.values:
-            next_item: BaseSymbol | None = state.get_next_item()
-            
-            if next_item is None:
-                continue
-            
-            results.setdefault(next_item, Table()).add(state.shifted())
+        The result is cached per state, and is shared between closure computation and action table building.
+        Equal results are also shared between states, since there are far fewer distinct ones.
+        """
         
-        return results
-    
-    def _first_k(self, rule_symbols: typing.Sequence[BaseSymbol], continuation: typing.Tuple[T, ...]) -> typing.Generator[typing.Tuple[T, ...], None, None]:
-        return self._first_k_provider.first_k(rule_symbols, continuation)
+        result: typing.FrozenSet[typing.Tuple[T, ...]] | None = self._lookaheads_cache.get(state)
+        
+        if result is None:
+            result = frozenset(self._first_k_provider.first_k_after(state.rule, state.rule_pos, state.continuation))
+            result = self._lookaheads_cache[state] = self._lookahead_sets.setdefault(result, result)
+        
+        return result
     
     @property
     def _rules_by_lhs(self) -> typing.Mapping[Nonterminal, typing.Collection[Rule[T]]]:
         return self._first_k_provider.rules_by_lhs
     
-    def build(self) -> typing.Tuple[FrozenTable[T], typing.Set[FrozenTable[T]]]:
-        start_table: Table[T] = Table.initial(self._first_k_provider.new_start_rule)
+    def build(self, lalr: bool = False) -> typing.Tuple[FrozenTable[T], typing.Set[FrozenTable[T]]]:
+        """
+        Builds the tables and returns the root one along with all of them.
+        
+        With `lalr`, tables with the same LR(0) core are merged afterwards, see `_merge_cores`.
+        """
+        
+        start_table: Table[T] = Table.initial(self._make_state(self._first_k_provider.new_start_rule))
         root: FrozenTable[T] = self._add_table(start_table)
         
         while self._tables.has_new():
             table: FrozenTable[T] = self._tables.process()
             
+            gotos: typing.List[FrozenTable[T] | None] = [None] * len(self._symbols)
+            
             for symbol, next_table in self._goto(table).items():
-                table.gotos[symbol] = self._add_table(next_table)
+                gotos[self._symbol_ids[symbol]] = self._add_table(next_table)
+            
+            table.gotos[:] = gotos
         
         # debug(">", root)
         
+        if lalr:
+            return self._merge_cores(root)
+        
         return root, set(self._tables)
     
+    def _merge_cores(self, root: FrozenTable[T]) -> typing.Tuple[FrozenTable[T], typing.Set[FrozenTable[T]]]:
+        """
+        Merges the tables that only differ in continuations, like LALR does.
+        
+        This usually shrinks the automaton a lot, but may introduce reduce-reduce conflicts
+        that the canonical tables didn't have. These are reported when building the actions.
+        """
+        
+        def core_of(table: FrozenTable[T]) -> typing.FrozenSet[typing.Tuple[Rule[T], int]]:
+            # Keyed by the rules' values, so that equal cores always land in the same group
+            return frozenset((state.rule, state.rule_pos) for state in table.values)
+        
+        cores: typing.Dict[FrozenTable[T], typing.FrozenSet[typing.Tuple[Rule[T], int]]] = {}
+        groups: typing.Dict[typing.FrozenSet[typing.Tuple[Rule[T], int]], typing.List[FrozenTable[T]]] = {}
+        
+        for table in self._tables:
+            core = cores[table] = core_of(table)
+            groups.setdefault(core, []).append(table)
+        
+        merged: typing.Dict[typing.FrozenSet[typing.Tuple[Rule[T], int]], FrozenTable[T]] = {}
+        
+        for core, tables in groups.items():
+            union: Table[T] = Table(new_values=itertools.chain.from_iterable(table.values for table in tables))
+            union.process_all()
+            
+            merged[core] = union.freeze()
+        
+        for core, tables in groups.items():
+            # Tables with the same core have gotos with the same cores, so any of them will do
+            merged[core].gotos[:] = [
+                merged[cores[target]] if target is not None else None
+                for target in tables[0].gotos
+            ]
+        
+        return merged[cores[root]], set(merged.values())
+    
+    def iter_gotos(self, table: FrozenTable[T]) -> typing.Generator[typing.Tuple[BaseSymbol, FrozenTable[T]], None, None]:
+        """
+        Iterates over the existing transitions of the given table, as (symbol, target) pairs.
+        """
+        
+        symbols = self._symbols
+        
+        for symbol_id, target in enumerate(table.gotos):
+            if target is not None:
+                yield symbols[symbol_id], target
+    
     @property
     def first_k_provider(self) -> FirstKProvider[T]:
         return self._first_k_provider
@@ -282,68 +715,227 @@ class Action(typing.Generic[T]):
     shift: Unit
     reduce: Rule[T]
     accept: Unit
+    # A reduce by a rule with a single symbol in its rhs. It just replaces the top of the stack,
+    # so the parser handles it without popping and pushing
+    reduce_unit: Rule[T]
+
 
+# The payload-less actions are immutable, so there's no need for more than one instance of each
+_SHIFT: typing.Final[Action.shift] = Action.shift()
+_ACCEPT: typing.Final[Action.accept] = Action.accept()
 
+
+# Slots are declared by hand, since `dataclass(slots=True)` requires Python 3.10
 @dataclasses.dataclass(frozen=True)
 class Transition(typing.Generic[T]):
+    __slots__ = ("target",)
+    
     target: LRState[T]
+    
+    def __reduce__(self):
+        # Slotted frozen dataclasses can't be restored through setattr.
+        # The target brings its whole automaton along, see `LRState.__reduce__`
+        return Transition, (self.target,)
 
 
-@dataclasses.dataclass()
+# Compared by identity, since comparing the contents would recurse through the whole automaton
+@dataclasses.dataclass(init=False, eq=False)
 class LRState(typing.Generic[T]):
-    actions: typing.Dict[typing.Tuple[T, ...], Action[T]] = dataclasses.field(default_factory=dict)
-    transitions: typing.Dict[BaseSymbol | T, Transition[T]] = dataclasses.field(default_factory=dict)
+    __slots__ = ("actions", "transitions", "lookahead_actions")
+    
+    actions: typing.Dict[typing.Tuple[T, ...], Action[T]]
+    transitions: typing.Dict[BaseSymbol | T, Transition[T]]
+    # The same actions keyed the way the parser sees the lookahead: by the single token for k=1,
+    # with the EOF token for `()`, and packed into an int for k>1 (see `LRParserConfig`).
+    # Not built by LRTablesBuilder, since it depends on the EOF token
+    lookahead_actions: typing.Dict[T | int, Action[T]] | None
+    
+    def __init__(self,
+                 actions: typing.Dict[typing.Tuple[T, ...], Action[T]] | None = None,
+                 transitions: typing.Dict[BaseSymbol | T, Transition[T]] | None = None):
+        self.actions = actions if actions is not None else {}
+        self.transitions = transitions if transitions is not None else {}
+        self.lookahead_actions = None
+    
+    def __reduce__(self):
+        # Pickling the graph as is would recurse once per transition, which overflows the stack
+        # on large automata. So everything reachable from this state is pickled as a flat list instead
+        return _restore_lr_states, (_flatten_lr_states(self),)
+
+
+# Per state: the actions, the lookahead actions, and the transitions with their targets' indices
+_FlatLRState = typing.Tuple[
+    typing.Dict[typing.Tuple[T, ...], Action[T]],
+    typing.Optional[typing.Dict[typing.Union[T, int], Action[T]]],
+    typing.Dict[typing.Union[BaseSymbol, T], int],
+]
+
+
+def _flatten_lr_states(root: LRState[T]) -> typing.List[_FlatLRState[T]]:
+    """
+    Lists the states reachable from the given one, root first, with the transitions' targets replaced by their indices.
+    """
+    
+    indices: typing.Dict[int, int] = {id(root): 0}
+    # Doubles as the BFS queue, since it's never shrunk
+    order: typing.List[LRState[T]] = [root]
+    
+    for state in order:
+        for transition in state.transitions.values():
+            if id(transition.target) not in indices:
+                indices[id(transition.target)] = len(order)
+                order.append(transition.target)
+    
+    return [
+        (
+            state.actions,
+            state.lookahead_actions,
+            {key: indices[id(transition.target)] for key, transition in state.transitions.items()},
+        )
+        for state in order
+    ]
+
+
+def _restore_lr_states(flat_states: typing.List[_FlatLRState[T]]) -> LRState[T]:
+    """
+    The inverse of `_flatten_lr_states`. Returns the root state.
+    """
+    
+    states: typing.List[LRState[T]] = [LRState(actions) for actions, _, _ in flat_states]
+    # Transitions are immutable, so a single one per target is enough
+    transitions: typing.List[Transition[T]] = [Transition(state) for state in states]
+    
+    for state, (_, lookahead_actions, targets) in zip(states, flat_states):
+        state.lookahead_actions = lookahead_actions
+        state.transitions = {key: transitions[index] for key, index in targets.items()}
+    
+    return states[0]
+
+
+# Bump whenever the layout of the built tables changes, so that stale caches are ignored
+_TABLES_FORMAT_VERSION: typing.Final[int] = 7
+
+
+def _grammar_fingerprint(grammar: Grammar[T], k: int, lalr: bool = False) -> str:
+    """
+    A stable digest of the grammar's rules and the build options, independent of the rules' order.
+    """
+    
+    def describe(symbol: BaseSymbol) -> str:
+        return f"{type(symbol).__qualname__}:{symbol!r}"
+    
+    rules: typing.List[str] = sorted(
+        " ".join(map(describe, itertools.chain((rule.lhs,), rule.rhs)))
+        for rule in grammar.rules
+    )
+    
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{_TABLES_FORMAT_VERSION} k={k} lalr={lalr} start={describe(grammar.new_start)}\n".encode())
+    
+    for rule in rules:
+        digest.update(rule.encode())
+        digest.update(b"\n")
+    
+    return digest.hexdigest()
 
 
 class LRTablesBuilder(typing.Generic[T]):
-    _vgk_builder: VGkBuilder[T]
+    _grammar: Grammar[T]
+    _k: int
+    _lalr: bool
+    _cache_dir: pathlib.Path | None
     _states: typing.Dict[FrozenTable[T], LRState[T]]
+    _reduce_actions: typing.Dict[Rule[T], Action[T]]
+    _actions_cache: typing.Dict[typing.FrozenSet[State[T]], typing.Dict[typing.Tuple[T, ...], Action[T]]]
     
-    def __init__(self, grammar: Grammar[T], k: int) -> None:
-        self._vgk_builder = VGkBuilder(grammar, k)
+    def __init__(self, grammar: Grammar[T], k: int, cache_dir: str | os.PathLike | None = None, lalr: bool = False) -> None:
+        """
+        If `cache_dir` is given, the built tables are pickled there, keyed by the grammar,
+        and reused by later builds of the same grammar instead of building them anew.
+        
+        If `lalr` is set, LALR(k) tables are built instead of the canonical LR(k) ones.
+        """
+        
+        self._grammar = grammar
+        self._k = k
+        self._lalr = lalr
+        self._cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else None
         self._states = {}
+        self._reduce_actions = {}
+        self._actions_cache = {}
+    
+    @cached_property
+    def _vgk_builder(self) -> VGkBuilder[T]:
+        # Created lazily, since even preparing it is wasted if the tables are cached
+        return VGkBuilder(self._grammar, self._k)
+    
+    def _reduce_action(self, rule: Rule[T]) -> Action[T]:
+        """
+        Returns the shared reduce action for the given rule.
+        
+        Each rule is reduced in lots of states, so there's no point in a separate action for each of them.
+        """
+        
+        action: Action[T] | None = self._reduce_actions.get(rule)
+        
+        if action is None:
+            action = self._reduce_actions[rule] = (Action.reduce_unit if len(rule) == 1 else Action.reduce)(rule)
+        
+        return action
     
     def _build_actions(self, lr_state: LRState[T], vgk: FrozenTable[T]) -> None:
-        actions: typing.Dict[typing.Tuple[T, ...], Action[T]] = lr_state.actions
-        assert not actions, "Transitions already built"
+        assert not lr_state.actions, "Transitions already built"
         
-        first_k_provider = self._vgk_builder.first_k_provider
+        shifting: typing.Iterable[typing.Tuple[State[T], ...]] = (
+            states for next_item, states in vgk.by_next.items() if next_item.is_terminal()
+        )
         
-        for state in vgk.values:
-            # Shift
-            if state.rule_pos < len(state.rule):
-                next_item: BaseSymbol = state.rule.rhs[state.rule_pos]
-                
-                if not next_item.is_terminal():
-                    continue
-                
-                valid_continuations = first_k_provider.first_k(
-                    state.rule.rhs[state.rule_pos:], state.continuation
-                )
-                
-                for continuation in valid_continuations:
-                    if continuation in actions and not isinstance(actions[continuation], Action.shift):
-                        raise LRConflict("Shift-reduce conflict")
-                    
-                    actions[continuation] = Action.shift()
-
+        # The actions only depend on these states, and different tables often share them all.
+        # Such tables share the same actions dict then, which is fine since it's never modified afterwards
+        key: typing.FrozenSet[State[T]] = frozenset(itertools.chain(vgk.completed, *shifting))
+        
+        actions: typing.Dict[typing.Tuple[T, ...], Action[T]] | None = self._actions_cache.get(key)
+        
+        if actions is None:
+            actions = self._actions_cache[key] = self._compute_actions(vgk)
+        
+        lr_state.actions = actions
+    
+    def _compute_actions(self, vgk: FrozenTable[T]) -> typing.Dict[typing.Tuple[T, ...], Action[T]]:
+        actions: typing.Dict[typing.Tuple[T, ...], Action[T]] = {}
+        
+        new_start: Nonterminal[T] = self._vgk_builder.first_k_provider.new_start
+        # Cached per state, and mostly computed during the closure already
+        lookaheads = self._vgk_builder.lookaheads
+        
+        # Shift
+        for next_item, states in vgk.by_next.items():
+            if not next_item.is_terminal():
                 continue
             
+            for state in states:
+                for continuation in lookaheads(state):
+                    # Only shifts have been added so far
+                    actions[continuation] = _SHIFT
+        
+        for state in vgk.completed:
             # Accept
-            if state.rule.lhs == first_k_provider.new_start and not state.continuation:
+            if state.rule.lhs == new_start and not state.continuation:
                 assert state.continuation not in actions, "Accept conflicts should be impossible"
                 
-                actions[state.continuation] = Action.accept()
+                actions[state.continuation] = _ACCEPT
 
                 continue
             
             # Reduce
             if state.continuation in actions:
                 raise LRConflict("{}-reduce conflict".format(
-                    "Shift" if isinstance(actions[state.continuation], Action.shift) else "Reduce"
+                    "Shift" if actions[state.continuation] is _SHIFT else "Reduce"
                 ))
             
-            actions[state.continuation] = Action.reduce(state.rule)
+            actions[state.continuation] = self._reduce_action(state.rule)
+        
+        return actions
     
     def _state_for(self, vgk: FrozenTable[T]) -> LRState[T]:
         """
@@ -359,22 +951,75 @@ class LRTablesBuilder(typing.Generic[T]):
         
         return self._states[vgk]
     
-    def _process(self, vgk: FrozenTable[T]) -> LRState[T]:
-        lr_state = self._state_for(vgk)
+    def _process(self, root_vgk: FrozenTable[T]) -> LRState[T]:
+        """
+        Builds the states for every V_G^k reachable from the given one, and returns the root state.
         
-        for symbol, next_vgk in vgk.gotos.items():
-            transition = Transition(self._process(next_vgk))
-            
-            lr_state.transitions[symbol] = transition
+        The goto graph may be large and has cycles, so it's traversed with an explicit queue.
+        The first pass creates all the states, and the second one wires the transitions between them.
+        """
+        
+        iter_gotos = self._vgk_builder.iter_gotos
+        
+        order: typing.List[FrozenTable[T]] = [root_vgk]
+        self._state_for(root_vgk)
+        
+        # `order` doubles as the BFS queue, since it's never shrunk
+        for vgk in order:
+            for _, next_vgk in iter_gotos(vgk):
+                if next_vgk not in self._states:
+                    self._state_for(next_vgk)
+                    order.append(next_vgk)
+        
+        for vgk in order:
+            transitions: typing.Dict[BaseSymbol | T, Transition[T]] = self._states[vgk].transitions
             
-            if symbol.is_terminal():
-                # A bit hacky, but whatever...
-                lr_state.transitions[symbol.get_token()] = transition
+            for symbol, next_vgk in iter_gotos(vgk):
+                transition = Transition(self._states[next_vgk])
+                
+                transitions[symbol] = transition
+                
+                if symbol.is_terminal():
+                    # A bit hacky, but whatever...
+                    transitions[symbol.get_token()] = transition
         
-        return lr_state
+        return self._states[root_vgk]
     
     def build(self) -> LRState:
-        return self._process(self._vgk_builder.build()[0])
+        if self._cache_dir is None:
+            return self._do_build()
+        
+        cache_path: pathlib.Path = self._cache_dir / f"lr_tables_{_grammar_fingerprint(self._grammar, self._k, self._lalr)}.pkl"
+        
+        try:
+            with open(cache_path, "rb") as cache_file:
+                return pickle.load(cache_file)
+        except Exception:
+            # Missing, corrupted or stale. The latter may fail in all sorts of ways
+            # (AttributeError, ImportError, TypeError...) if some class layout has changed
+            # without bumping the format version, so any failure just means it's rebuilt and overwritten
+            pass
+        
+        root: LRState[T] = self._do_build()
+        
+        # Written to a temporary file first, so that concurrent builds never see a partial cache
+        temp_path: pathlib.Path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            
+            with open(temp_path, "wb") as cache_file:
+                pickle.dump(root, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            
+            os.replace(temp_path, cache_path)
+        except (OSError, pickle.PicklingError):
+            # The cache is just an optimization, so failing to write it isn't an error
+            temp_path.unlink(missing_ok=True)
+        
+        return root
+    
+    def _do_build(self) -> LRState:
+        return self._process(self._vgk_builder.build(lalr=self._lalr)[0])
 
 
 __all__ = [
@@ -5,6 +5,9 @@ import enum
 import dataclasses
 import numbers
 import io
+import types
+import re
+import sys
 from functools import cached_property
 
 
@@ -59,27 +62,149 @@ class EOFTok(Token):
     pass
 
 
+class _MiscTokVerdict(enum.IntEnum):
+    NONE = enum.auto()
+    PUNCT = enum.auto()
+    LINE_COMMENT = enum.auto()
+    BLOCK_COMMENT = enum.auto()
+    STRING_QUOTE = enum.auto()
+
+
+class _StringVerdict(enum.IntEnum):
+    NONE = enum.auto()
+    ESCAPE = enum.auto()
+    END_QUOTE = enum.auto()
+
+
+class _BlockCommentVerdict(enum.IntEnum):
+    NONE = enum.auto()
+    START = enum.auto()
+    END = enum.auto()
+
+
+def _build_checker_func(chars: typing.Container[str] | typing.Callable[[str], bool] | typing.Pattern[str]) -> typing.Callable[[str], bool]:
+    if isinstance(chars, typing.Pattern):
+        match = chars.fullmatch
+        return lambda ch: match(ch) is not None
+    
+    if not callable(chars):
+        container = chars
+        return lambda ch: ch in container
+    
+    return chars
+
+
+def _build_char_pattern(chars: typing.Container[str] | typing.Callable[[str], bool] | typing.Pattern[str]) -> typing.Pattern[str] | None:
+    """
+    Returns a pattern matching a single one of the given characters, if they can be expressed as one.
+    """
+    
+    if isinstance(chars, typing.Pattern):
+        return chars
+    
+    # A class can only hold single characters, and `[]` isn't a valid one. Anything else is left to the checker
+    if isinstance(chars, (str, typing.AbstractSet)) and chars and all(len(ch) == 1 for ch in chars):
+        return re.compile("[" + re.escape("".join(chars)) + "]")
+    
+    return None
+
+
+# Shared, read-only defaults for the config, so that constructing one doesn't allocate fresh dicts
+_EMPTY_LOOKUP: typing.Final[typing.Mapping[str, typing.Any]] = types.MappingProxyType({})
+_DEFAULT_STRING_QUOTES: typing.Final[typing.Mapping[str, str]] = types.MappingProxyType({
+    "'": "'", '"': '"',
+})
+_DEFAULT_STRING_ESCAPES: typing.Final[typing.Mapping[str, str]] = types.MappingProxyType({
+    "\\": "\\", "n": "\n", "t": "\t", "r": "\r", "0": "\0",
+    '"': '"', "'": "'",
+})
+
+
 @dataclasses.dataclass(frozen=True)
 class BasicTokenizerConfig(typing.Generic[P, K]):
     parse_numbers: bool = True
-    punct_lookup: typing.Mapping[str, P] = dataclasses.field(default_factory=dict)
-    kwd_lookup: typing.Mapping[str, K] = dataclasses.field(default_factory=dict)
+    punct_lookup: typing.Mapping[str, P] = dataclasses.field(default_factory=lambda: _EMPTY_LOOKUP)
+    kwd_lookup: typing.Mapping[str, K] = dataclasses.field(default_factory=lambda: _EMPTY_LOOKUP)
     # Note: if parse_numbers is True, then the first letter cannot be a digit
     #       (even if the identifier wouldn't form a valid number)
-    name_chars: typing.Container[str] | typing.Callable[[str], bool] = \
-        lambda ch: ch.isalnum() or ch == "_"
-    space_chars: typing.Container[str] | typing.Callable[[str], bool] = \
-        str.isspace
+    # Patterns should match a single character. Unlike callables, they let whole names be scanned at once
+    name_chars: typing.Container[str] | typing.Callable[[str], bool] | typing.Pattern[str] = \
+        re.compile(r"\w")  # Same as `ch.isalnum() or ch == "_"`
+    space_chars: typing.Container[str] | typing.Callable[[str], bool] | typing.Pattern[str] = \
+        re.compile(r"\s")  # Same as `str.isspace`
     line_comments: typing.Collection[str] = ()
-    block_comments: typing.Mapping[str, str] = dataclasses.field(default_factory=dict)
-    string_quotes: typing.Mapping[str, str] = dataclasses.field(default_factory=lambda: {
-        "'": "'", '"': '"',
-    })
+    block_comments: typing.Mapping[str, str] = dataclasses.field(default_factory=lambda: _EMPTY_LOOKUP)
+    string_quotes: typing.Mapping[str, str] = dataclasses.field(default_factory=lambda: _DEFAULT_STRING_QUOTES)
     # chainable_strings: bool = False
-    string_escapes: typing.Mapping[str, str] = dataclasses.field(default_factory=lambda: {
-        "\\": "\\", "n": "\n", "t": "\t", "r": "\r", "0": "\0",
-        '"': '"', "'": "'",
-    })
+    string_escapes: typing.Mapping[str, str] = dataclasses.field(default_factory=lambda: _DEFAULT_STRING_ESCAPES)
+    
+    # The derived lookup structures live here rather than on the tokenizers, so that they're built once
+    # per config (which is frozen and usually shared, like BNFMetaParser's) and not once per input
+    
+    @cached_property
+    def _is_name_char(self) -> typing.Callable[[str], bool]:
+        return _build_checker_func(self.name_chars)
+    
+    @cached_property
+    def _name_char_pattern(self) -> typing.Pattern[str] | None:
+        return _build_char_pattern(self.name_chars)
+    
+    @cached_property
+    def _is_space_char(self) -> typing.Callable[[str], bool]:
+        return _build_checker_func(self.space_chars)
+    
+    @cached_property
+    def _space_char_pattern(self) -> typing.Pattern[str] | None:
+        return _build_char_pattern(self.space_chars)
+    
+    @cached_property
+    def _punct_toks(self) -> typing.Dict[str, PunctTok[P]]:
+        return {word: PunctTok(punct) for word, punct in self.punct_lookup.items()}
+    
+    @cached_property
+    def _misc_words(self) -> typing.Dict[str, _MiscTokVerdict]:
+        """
+        All the words that may start a non-name token. They are few, so they're matched by
+        looking up the upcoming characters directly, longest first, instead of walking a trie.
+        """
+        
+        words: typing.Dict[str, _MiscTokVerdict] = {}
+        
+        for wordlist, verdict in (
+            (self.line_comments, _MiscTokVerdict.LINE_COMMENT),
+            (self.block_comments.keys(), _MiscTokVerdict.BLOCK_COMMENT),
+            (self.punct_lookup.keys(), _MiscTokVerdict.PUNCT),
+            (self.string_quotes.keys(), _MiscTokVerdict.STRING_QUOTE),
+        ):
+            for word in wordlist:
+                if word in words:
+                    raise ValueError(f"Word {word!r} already exists in the trie")
+                
+                words[word] = verdict
+        
+        return words
+    
+    @cached_property
+    def _misc_max_len(self) -> int:
+        return max(map(len, self._misc_words), default=0)
+    
+    @cached_property
+    def _string_trie(self) -> _CompiledTrie[_StringVerdict]:
+        trie = _Trie(_StringVerdict.NONE)
+        
+        trie.add_wordlist(("\\" + k for k in self.string_escapes.keys()), _StringVerdict.ESCAPE)
+        trie.add_wordlist(self.string_quotes.values(), _StringVerdict.END_QUOTE)
+        
+        return trie.compile()
+    
+    @cached_property
+    def _block_comment_trie(self) -> _CompiledTrie[_BlockCommentVerdict]:
+        trie = _Trie(_BlockCommentVerdict.NONE)
+        
+        trie.add_wordlist(self.block_comments.keys(), _BlockCommentVerdict.START)
+        trie.add_wordlist(self.block_comments.values(), _BlockCommentVerdict.END)
+        
+        return trie.compile()
 
 
 _E = typing.TypeVar("_E", bound=enum.Enum)
@@ -87,82 +212,84 @@ def lookup_from_enum(enum: typing.Type[_E]) -> typing.Dict[str, _E]:
     return {member.value: member for member in enum}
 
 
-class _Trie(typing.Generic[T]):
-    @dataclasses.dataclass()
-    class Node:
-        verdict: T
-        master: _Trie[T]
-        children: typing.Dict[str, _Trie.Node] = dataclasses.field(default_factory=dict)
-        
-        def is_term(self) -> bool:
-            return not self.children
-        
-        def get_child(self, ch: str) -> _Trie.Node:
-            assert len(ch) == 1
-            
-            return self.children.get(ch, self.master._sentinel)
-        
-        def add_child(self, ch: str, verdict: T) -> _Trie.Node:
-            return self.children.setdefault(ch, _Trie.Node(verdict, self.master))
+@dataclasses.dataclass(frozen=True)
+class _CompiledTrie(typing.Generic[T]):
+    """
+    A frozen `_Trie`, with all the per-node data as parallel sequences indexed by node ids.
     
-    class WordChecker:
-        _node: _Trie.Node
-        _word: typing.List[str]
-        
-        def __init__(self, node: _Trie.Node):
-            self._node = node
-            self._word = []
-        
-        def is_term(self) -> bool:
-            return self._node.is_term()
-        
-        def go(self, ch: str) -> None:
-            assert len(ch) <= 1
-            
-            if not ch:
-                return
-            
-            self._node = self._node.get_child(ch)
-            self._word.append(ch)
-        
-        def restart(self) -> None:
-            self._node = self._node.master._root
-            self._word = []
-        
-        def get_verdict(self) -> T:
-            return self._node.verdict
-        
-        def get_word(self) -> str:
-            return "".join(self._word)
-        
+    Walking it takes a single dict lookup per character, with no method calls involved.
+    """
+    
+    # Indexed by node ids. transitions[node id][char] -> child id, missing entries lead to the sentinel
+    transitions: typing.Sequence[typing.Mapping[str, int]]
+    verdicts: typing.Sequence[T]
+    is_term: typing.Sequence[bool]
+    words: typing.Sequence[str]
+    root: int
+    sentinel: int
+    # The characters any word may start with. Everything else falls off the trie right away
+    first_chars: str
+
+
+class _Trie(typing.Generic[T]):
+    """
+    A trie stored as parallel lists indexed by node ids, rather than as node objects. The root is 0.
+    """
     
     _verdict_none: typing.Final[T]
-    _root: typing.Final[Node]
-    _sentinel: typing.Final[Node]
+    _children: typing.Final[typing.List[typing.Dict[str, int]]]
+    _verdicts: typing.Final[typing.List[T]]
+    _words: typing.Final[typing.List[str]]
     
     def __init__(self, verdict_none: T):
         self._verdict_none = verdict_none
-        self._root = self.Node(verdict_none, self)
-        self._sentinel = self.Node(verdict_none, self)
+        self._children = [{}]
+        self._verdicts = [verdict_none]
+        self._words = [""]
     
-    def add_word(self, word: str, verdict: T) -> None:
-        verdict_none = self._verdict_none
+    def _add_child(self, node: int, ch: str) -> int:
+        children: typing.Dict[str, int] = self._children[node]
+        child: int | None = children.get(ch)
         
-        node = self._root
+        if child is None:
+            child = children[ch] = len(self._children)
+            self._children.append({})
+            self._verdicts.append(self._verdict_none)
+            self._words.append(self._words[node] + ch)
+        
+        return child
+    
+    def add_word(self, word: str, verdict: T) -> None:
+        node: int = 0
         for ch in word:
-            node = node.add_child(ch, verdict_none)
+            node = self._add_child(node, ch)
         
-        if node.verdict != verdict_none:
+        if self._verdicts[node] != self._verdict_none:
             raise ValueError(f"Word {word!r} already exists in the trie")
         
-        node.verdict = verdict
+        self._verdicts[node] = verdict
     
     def add_wordlist(self, words: typing.Iterable[str], verdict: T) -> None:
         for word in words:
             self.add_word(word, verdict)
     
-    def create_checker(self) -> _Trie.WordChecker:
-        return self.WordChecker(self._root)
+    def compile(self) -> _CompiledTrie[T]:
+        """
+        Freezes the trie. The node ids are kept, and the sentinel comes last.
+        """
+        
+        # Has no children, so it's terminal and loops on itself
+        sentinel: int = len(self._children)
+        
+        return _CompiledTrie(
+            transitions=tuple(self._children) + ({},),
+            verdicts=tuple(self._verdicts) + (self._verdict_none,),
+            is_term=tuple(not children for children in self._children) + (True,),
+            words=tuple(self._words) + ("",),
+            root=0,
+            sentinel=sentinel,
+            first_chars="".join(self._children[0].keys()),
+        )
 
 
 class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
@@ -170,25 +297,18 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
     A tokenizer for a common use case, where the tokens are keywords, punctuation and optionally numbers.
     """
     
-    class _MiscTokVerdict(enum.IntEnum):
-        NONE = enum.auto()
-        PUNCT = enum.auto()
-        LINE_COMMENT = enum.auto()
-        BLOCK_COMMENT = enum.auto()
-        STRING_QUOTE = enum.auto()
-    
-    class _StringVerdict(enum.IntEnum):
-        NONE = enum.auto()
-        ESCAPE = enum.auto()
-        END_QUOTE = enum.auto()
-    
-    class _BlockCommentVerdict(enum.IntEnum):
-        NONE = enum.auto()
-        START = enum.auto()
-        END = enum.auto()
+    class _CharClass(enum.IntEnum):
+        SPACE = enum.auto()
+        NUMBER = enum.auto()
+        NAME = enum.auto()
+        OTHER = enum.auto()
     
     _config: BasicTokenizerConfig[P, K]
     _input: PeekableTextIO
+    # Repeated names share a single token object
+    _name_cache: typing.Dict[str, NameTok]
+    # A reusable accumulator for the token being built. Tokens are parsed one at a time, so one is enough
+    _scratch: typing.List[str]
     
     def __init__(self,
                  input: PeekableTextIO | io.TextIOBase | str,
@@ -203,55 +323,25 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
         
         self._config = config
         self._input = input
+        self._name_cache = {}
+        self._scratch = []
     
-    @staticmethod
-    def _build_checker_func(chars: typing.Container[str] | typing.Callable[[str], bool]) -> typing.Callable[[str], bool]:
-        if not callable(chars):
-            chars = lambda ch: ch in chars
-        return chars
-
-    @cached_property
-    def _is_name_char(self) -> typing.Callable[[str], bool]:
-        return self._build_checker_func(self._config.name_chars)
-    
-    @cached_property
-    def _is_space_char(self) -> typing.Callable[[str], bool]:
-        return self._build_checker_func(self._config.space_chars)
-    
-    @cached_property
-    def _misc_tokens_trie(self) -> _Trie[_MiscTokVerdict]:
-        trie = _Trie(self._MiscTokVerdict.NONE)
-        
-        trie.add_wordlist(self._config.line_comments, self._MiscTokVerdict.LINE_COMMENT)
-        trie.add_wordlist(self._config.block_comments.keys(), self._MiscTokVerdict.BLOCK_COMMENT)
-        trie.add_wordlist(self._config.punct_lookup.keys(), self._MiscTokVerdict.PUNCT)
-        trie.add_wordlist(self._config.string_quotes.keys(), self._MiscTokVerdict.STRING_QUOTE)
-        
-        return trie
-    
-    @cached_property
-    def _string_trie(self) -> _Trie[_StringVerdict]:
-        trie = _Trie(self._StringVerdict.NONE)
-        
-        trie.add_wordlist(("\\" + k for k in self._config.string_escapes.keys()), self._StringVerdict.ESCAPE)
-        trie.add_wordlist(self._config.string_quotes.values(), self._StringVerdict.END_QUOTE)
-        
-        return trie
-    
-    @cached_property
-    def _block_comment_trie(self) -> _Trie[_StringVerdict]:
-        trie = _Trie(self._BlockCommentVerdict.NONE)
-        
-        trie.add_wordlist(self._config.block_comments.keys(), self._BlockCommentVerdict.START)
-        trie.add_wordlist(self._config.block_comments.values(), self._BlockCommentVerdict.END)
-        
-        return trie
+    def _classify_char(self, ch: str) -> _CharClass:
+        if not ch or self._config._is_space_char(ch):
+            return self._CharClass.SPACE
+        if self._config.parse_numbers and ch.isdigit():
+            return self._CharClass.NUMBER
+        if self._config._is_name_char(ch):
+            return self._CharClass.NAME
+        return self._CharClass.OTHER
     
     def tokenize(self) -> typing.Generator[Token, None, None]:
         # Locals to speed up access
-        is_name_char = self._is_name_char
-        is_space_char = self._is_space_char
-        parse_numbers = self._config.parse_numbers
+        SPACE, NUMBER, NAME = self._CharClass.SPACE, self._CharClass.NUMBER, self._CharClass.NAME
+        classify_char = self._classify_char
+        space_char_pattern = self._config._space_char_pattern
+        # The predicates are assumed to be pure, so each char only has to be classified once
+        char_classes: typing.Dict[str, BasicTokenizer._CharClass] = {}
         
         # This is the first and last time I'll comment on this, so please note:
         # PeekableStreamIterator is implemented in a specific way that allows for
@@ -260,11 +350,20 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
         # the tokenization logic in a way that is very easy to understand,
         # without any need for explicit lookaheads or backtracking.
         for ch in self._input:
-            if is_space_char(ch) or not ch:
+            char_class: BasicTokenizer._CharClass | None = char_classes.get(ch)
+            
+            if char_class is None:
+                char_class = char_classes[ch] = classify_char(ch)
+            
+            if char_class is SPACE:
+                # Skips the whole run at once. The iterator notices the stream has moved on, and won't advance it again
+                if space_char_pattern is not None:
+                    self._input.read_while(space_char_pattern)
+                
                 continue
-            elif parse_numbers and ch.isdigit():
+            elif char_class is NUMBER:
                 yield self._parse_number()
-            elif is_name_char(ch):
+            elif char_class is NAME:
                 yield self._parse_name_or_kwd()
             else:
                 # Yield from because for a comment it would be empty
@@ -279,9 +378,25 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
         return self._config.kwd_lookup.get(name.value, name)
     
     def _parse_name(self) -> NameTok:
-        is_name_char = self._is_name_char
+        name: str = self._read_name()
+        
+        tok: NameTok | None = self._name_cache.get(name)
+        
+        if tok is None:
+            tok = self._name_cache[name] = NameTok(sys.intern(name))
+        
+        return tok
+    
+    def _read_name(self) -> str:
+        name_char_pattern: typing.Pattern[str] | None = self._config._name_char_pattern
+        
+        if name_char_pattern is not None:
+            return self._input.read_while(name_char_pattern)
         
-        name: typing.List[str] = []
+        is_name_char = self._config._is_name_char
+        
+        name: typing.List[str] = self._scratch
+        name.clear()
         
         for ch in self._input:
             if not is_name_char(ch):
@@ -289,36 +404,73 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
             
             name.append(ch)
         
-        return NameTok("".join(name))
+        return "".join(name)
 
-    def _parse_other(self) -> typing.Generator[PunctTok, None, None]:
-        checker = self._misc_tokens_trie.create_checker()
+    def _match_word(self, trie: _CompiledTrie[T]) -> typing.Tuple[T, str, bool]:
+        """
+        Consumes the longest word from the input that the trie can follow.
+        
+        Returns the verdict, the consumed word, and whether the word is complete (i.e. not cut short by the end of input).
+        """
+        
+        # Locals to speed up access
+        transitions = trie.transitions
+        is_term = trie.is_term
+        sentinel: int = trie.sentinel
+        
+        state: int = trie.root
+        # Only set when falling off the trie, since the sentinel doesn't know its word
+        word: str | None = None
         
         for ch in self._input:
-            if checker.is_term() or not ch:
+            if is_term[state]:
                 break
             
-            checker.go(ch)
+            if not ch:
+                return trie.verdicts[state], trie.words[state], False
+            
+            next_state: int = transitions[state].get(ch, sentinel)
+            
+            if next_state == sentinel:
+                word = trie.words[state] + ch
+            
+            state = next_state
+        
+        return trie.verdicts[state], word if word is not None else trie.words[state], True
+    
+    def _parse_other(self) -> typing.Generator[PunctTok, None, None]:
+        misc_words = self._config._misc_words
+        upcoming: str = self._input.lookahead(self._config._misc_max_len)
         
-        verdict: self._MiscTokVerdict = checker.get_verdict()
-        word: str = checker.get_word()
+        verdict: _MiscTokVerdict = _MiscTokVerdict.NONE
+        word: str = upcoming[:1]
         
-        if verdict == self._MiscTokVerdict.NONE:
+        # Maximal munch: the longest matching word wins
+        for length in range(len(upcoming), 0, -1):
+            verdict = misc_words.get(upcoming[:length], _MiscTokVerdict.NONE)
+            
+            if verdict != _MiscTokVerdict.NONE:
+                word = upcoming[:length]
+                break
+        
+        if verdict == _MiscTokVerdict.NONE:
             raise ParseError(f"Invalid punctuation/comment: {word}")
         
-        if verdict == self._MiscTokVerdict.PUNCT:
-            yield PunctTok(self._config.punct_lookup[word])
+        self._input.skip(len(word))
+        
+        if verdict == _MiscTokVerdict.PUNCT:
+            yield self._config._punct_toks[word]
             return
         
-        if verdict == self._MiscTokVerdict.STRING_QUOTE:
+        if verdict == _MiscTokVerdict.STRING_QUOTE:
             yield self._parse_string(word)
             return
         
-        if verdict == self._MiscTokVerdict.LINE_COMMENT:
+        if verdict == _MiscTokVerdict.LINE_COMMENT:
             self._parse_line_comment()
             return
         
-        if verdict == self._MiscTokVerdict.BLOCK_COMMENT:
+        if verdict == _MiscTokVerdict.BLOCK_COMMENT:
             self._parse_block_comment(word)
             return
         
@@ -327,68 +479,67 @@ class BasicTokenizer(Tokenizer[Token], typing.Generic[P, K]):
     def _parse_string(self, start_quote: str) -> StringTok:
         end_quote: typing.Final[str] = self._config.string_quotes[start_quote]
         
-        result: typing.List[str] = []
+        result: typing.List[str] = self._scratch
+        result.clear()
         
-        checker = self._string_trie.create_checker()
+        trie = self._config._string_trie
         
-        for ch in self._input:
-            if checker.is_term():
-                verdict: self._StringVerdict = checker.get_verdict()
-                word: str = checker.get_word()
-                
-                if verdict == self._StringVerdict.NONE:
-                    result.append(word)
-                elif verdict == self._StringVerdict.ESCAPE:
-                    assert word.startswith("\\")
-                    
-                    result.append(self._config.string_escapes[word.removeprefix("\\")])
-                elif word == end_quote:  # verdict == self._StringVerdict.END_QUOTE
-                    break
-                else:  # verdict == self._StringVerdict.END_QUOTE, but word != end_quote
-                    # It's a literal quote, just add it as is
-                    result.append(word)
-                
-                checker.restart()
+        while True:
+            # Plain characters would only fall off the trie one at a time, so they're skipped in bulk
+            result.append(self._input.read_until(trie.first_chars))
             
-            if not ch:
+            verdict: _StringVerdict
+            word: str
+            complete: bool
+            verdict, word, complete = self._match_word(trie)
+            
+            if not complete:
                 raise ParseError("Unterminated string")
             
-            checker.go(ch)
+            if verdict == _StringVerdict.NONE:
+                result.append(word)
+            elif verdict == _StringVerdict.ESCAPE:
+                assert word.startswith("\\")
+                
+                result.append(self._config.string_escapes[word.removeprefix("\\")])
+            elif word == end_quote:  # verdict == _StringVerdict.END_QUOTE
+                break
+            else:  # verdict == _StringVerdict.END_QUOTE, but word != end_quote
+                # It's a literal quote, just add it as is
+                result.append(word)
         
         return StringTok("".join(result))
 
     def _parse_line_comment(self) -> None:
-        for ch in self._input:
-            if ch == "\n":
-                break
+        self._input.read_until("\n")
     
     def _parse_block_comment(self, start: str) -> None:
         end = self._config.block_comments[start]
         
-        checker = self._block_comment_trie.create_checker()
+        trie = self._config._block_comment_trie
         balance: int = 1
         
-        for ch in self._input:
-            if checker.is_term():
-                verdict: self._BlockCommentVerdict = checker.get_verdict()
-                word: str = checker.get_word()
-                
-                if verdict == self._BlockCommentVerdict.NONE:
-                    pass
-                elif verdict == self._BlockCommentVerdict.START:
-                    balance += word == start
-                elif verdict == self._BlockCommentVerdict.END:
-                    balance -= word == end
-                
-                if balance == 0:
-                    break
-                
-                checker.restart()
+        while True:
+            # Same as for strings
+            self._input.read_until(trie.first_chars)
             
-            if not ch:
+            verdict: _BlockCommentVerdict
+            word: str
+            complete: bool
+            verdict, word, complete = self._match_word(trie)
+            
+            if not complete:
                 raise ParseError("Unterminated block comment")
             
-            checker.go(ch)
+            if verdict == _BlockCommentVerdict.NONE:
+                pass
+            elif verdict == _BlockCommentVerdict.START:
+                balance += word == start
+            elif verdict == _BlockCommentVerdict.END:
+                balance -= word == end
+            
+            if balance == 0:
+                break
 
 
 __all__ = [
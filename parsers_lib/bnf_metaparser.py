@@ -2,11 +2,11 @@ from __future__ import annotations
 import typing
 import io
 import enum
+import re
 import os
 
 
 from .basic_tokenizer import *
-from .peekable_stream import PeekableStream
 from .grammar import *
 from .errors import *
 from .abstract_parser import Parser
@@ -20,16 +20,27 @@ class BNFMetaParser(Parser[Grammar, Token]):
         LEFT_BRACE = "<"
         RIGHT_BRACE = ">"
         SEMICOLON = ";"
-
+    
+    # Prebuilt, since they're compared against on every token
+    _RULE_DEF_TOK: typing.Final[PunctTok[_Punct]] = PunctTok(_Punct.RULE_DEF)
+    _OR_TOK: typing.Final[PunctTok[_Punct]] = PunctTok(_Punct.OR)
+    _LEFT_BRACE_TOK: typing.Final[PunctTok[_Punct]] = PunctTok(_Punct.LEFT_BRACE)
+    _RIGHT_BRACE_TOK: typing.Final[PunctTok[_Punct]] = PunctTok(_Punct.RIGHT_BRACE)
+    _SEMICOLON_TOK: typing.Final[PunctTok[_Punct]] = PunctTok(_Punct.SEMICOLON)
+    # The tokens that end a rhs variant
+    _RHS_END_TOKS: typing.Final[typing.FrozenSet[Token]] = frozenset({_OR_TOK, _SEMICOLON_TOK})
+    
     _TOKENIZER_CONFIG: typing.Final[BasicTokenizerConfig[_Punct, None]] = BasicTokenizerConfig(
         parse_numbers=False,
         punct_lookup=lookup_from_enum(_Punct),
-        name_chars=lambda ch: ch.isalnum() or ch in "-_",
+        name_chars=re.compile(r"[\w-]"),  # Same as `ch.isalnum() or ch in "-_"`
         line_comments=("//", "#"),
         block_comments={"/*": "*/"},
     )
     
-    _source: PeekableStream[Token]
+    # The whole source is tokenized up front, and ends with an EOFTok sentinel
+    _tokens: typing.List[Token]
+    _pos: int
     _grammar: Grammar
     
     def __init__(self):
@@ -44,7 +55,9 @@ class BNFMetaParser(Parser[Grammar, Token]):
         Supply a source of text to parse. Note that it doesn't add to the existing source, it replaces it.
         """
         
-        self._source = PeekableStream(source, limit=1, sentinel=EOFTok())
+        self._tokens = list(source)
+        self._tokens.append(EOFTok())
+        self._pos = 0
         self._grammar = Grammar(start=start_nonterm)
     
     def parse(self) -> Grammar:
@@ -55,18 +68,35 @@ class BNFMetaParser(Parser[Grammar, Token]):
         
         self._uninitialize()
         
-        self._grammar = self._grammar.split_long_terminals()
+        # Terminals are already split into single characters by `_parse_terminal`,
+        # so all that's left is to make sure the start nonterminal exists
+        self._grammar.start
         
         return self._grammar
     
     def _is_initialized(self) -> bool:
-        return hasattr(self, "_source")
+        return hasattr(self, "_tokens")
     
     def _uninitialize(self) -> None:
-        del self._source
+        del self._tokens
+    
+    def _peek(self) -> Token:
+        return self._tokens[self._pos]
+    
+    def _next(self) -> Token:
+        tok: Token = self._tokens[self._pos]
+        
+        # The sentinel is never consumed
+        if self._pos + 1 < len(self._tokens):
+            self._pos += 1
+        
+        return tok
+    
+    def _is_over(self) -> bool:
+        return self._pos + 1 == len(self._tokens)
     
     def _expect(self, expected: Token | typing.Type[Token]) -> Token:
-        tok = self._source.peek1()
+        tok = self._peek()
         
         if isinstance(expected, type):
             if not isinstance(tok, expected):
@@ -75,10 +105,10 @@ class BNFMetaParser(Parser[Grammar, Token]):
             if tok != expected:
                 raise ParseError(f"Expected {expected}, got {tok}")
         
-        return self._source.next()
+        return self._next()
     
     def _parse_grammar(self) -> None:
-        while not self._source.is_over():
+        while not self._is_over():
             self._parse_rule()
         
         self._expect(EOFTok)
@@ -86,59 +116,67 @@ class BNFMetaParser(Parser[Grammar, Token]):
     def _parse_rule(self) -> None:
         lhs: Nonterminal = self._parse_nonterminal()
         
-        self._expect(PunctTok(self._Punct.RULE_DEF))
+        self._expect(self._RULE_DEF_TOK)
         
         for rhs in self._parse_rhs_variants():
             self._grammar.add_rule(Rule(lhs, rhs))
         
-        self._expect(PunctTok(self._Punct.SEMICOLON))
+        self._expect(self._SEMICOLON_TOK)
     
     def _parse_rhs_variants(self) -> typing.Generator[typing.Collection[BaseSymbol], None, None]:
         while True:
             yield self._parse_rhs()
             
-            if self._source.peek1() != PunctTok(self._Punct.OR):
+            if self._peek() != self._OR_TOK:
                 break
             
-            self._source.next()
+            self._next()
     
     def _parse_rhs(self) -> typing.Collection[BaseSymbol]:
         result: typing.List[BaseSymbol] = []
         
-        while True:
-            tok = self._source.peek1()
-            
-            if isinstance(tok, PunctTok) and tok.value in (self._Punct.OR, self._Punct.SEMICOLON):
-                break
-            
-            result.append(self._parse_any_symbol())
+        while self._peek() not in self._RHS_END_TOKS:
+            result.extend(self._parse_any_symbol())
         
         return result
     
-    def _parse_any_symbol(self) -> BaseSymbol:
-        tok = self._source.peek1()
+    def _parse_any_symbol(self) -> typing.Sequence[BaseSymbol]:
+        """
+        Parses a single symbol from the source, which may correspond to several symbols in the rhs.
+        """
+        
+        tok = self._peek()
         
-        if tok == PunctTok(self._Punct.LEFT_BRACE):
-            return self._parse_nonterminal()
+        handler: typing.Callable[[BNFMetaParser], typing.Sequence[BaseSymbol]] | None = \
+            self._SYMBOL_PARSERS.get(tok) or self._SYMBOL_PARSERS.get(type(tok))
         
-        if isinstance(tok, StringTok):
-            return self._parse_terminal()
+        if handler is None:
+            raise ParseError(f"Expected terminal or nonterminal, got {tok}")
         
-        raise ParseError("Expected terminal or nonterminal, got {tok}")
+        return handler(self)
     
     def _parse_nonterminal(self) -> Nonterminal:
-        self._expect(PunctTok(self._Punct.LEFT_BRACE))
+        self._expect(self._LEFT_BRACE_TOK)
         
         name = self._expect(NameTok).value
         
-        self._expect(PunctTok(self._Punct.RIGHT_BRACE))
+        self._expect(self._RIGHT_BRACE_TOK)
         
         return Nonterminal(name)
     
-    def _parse_terminal(self) -> StrTerminal:
-        # TODO: Split into many single-character terminals?
-        # I'll let the user do that manually for now, but it might be a good idea to do it automatically.
-        return StrTerminal(self._expect(StringTok).value)
+    def _parse_nonterminal_symbol(self) -> typing.Tuple[Nonterminal]:
+        return (self._parse_nonterminal(),)
+    
+    def _parse_terminal(self) -> typing.Tuple[StrTerminal, ...]:
+        # Split into single-character terminals right away, which saves
+        # a separate `Grammar.split_long_terminals` pass over the whole grammar
+        return tuple(map(StrTerminal, self._expect(StringTok).value))
+    
+    # Looked up by the token first, then by its type
+    _SYMBOL_PARSERS: typing.Final[typing.Dict[Token | typing.Type[Token], typing.Callable[[BNFMetaParser], typing.Sequence[BaseSymbol]]]] = {
+        _LEFT_BRACE_TOK: _parse_nonterminal_symbol,
+        StringTok: _parse_terminal,
+    }
 
 
 @typing.overload
@@ -2,6 +2,7 @@ from __future__ import annotations
 import typing
 import dataclasses
 import itertools
+from functools import cached_property
 
 
 from .grammar import *
@@ -13,50 +14,306 @@ from .utils import *
 T = typing.TypeVar("T", bound=Terminal)
 
 
-@dataclasses.dataclass(frozen=True)
+# Special values of `EarleyParserConfig.next_ids`. Nonterminal ids are non-negative
+_NEXT_NONE: typing.Final[int] = -1
+_NEXT_TERMINAL: typing.Final[int] = -2
+
+
 class State(typing.Generic[T]):
+    """
+    An immutable Earley item. States are compared and hashed by `key` alone, which packs
+    (start_offset, rule id, rule_pos) into a single int. See `EarleyParserConfig.make_key`.
+    
+    Tables only store the keys themselves; this is the decoded view of one,
+    made by `EarleyParserConfig.decode_state` for inspection.
+    """
+    
+    __slots__ = ("rule", "rule_id", "rule_pos", "start_offset", "key")
+    
     rule: Rule[T]
-    rule_pos: int = 0
-    start_offset: int = 0
+    rule_id: int
+    rule_pos: int
+    start_offset: int
+    key: int
     
-    def get_next_item(self) -> BaseSymbol | None:
-        if self.rule_pos == len(self.rule):
-            return None
+    def __init__(self, rule: Rule[T], rule_id: int, rule_pos: int, start_offset: int, key: int):
+        object.__setattr__(self, "rule", rule)
+        object.__setattr__(self, "rule_id", rule_id)
+        object.__setattr__(self, "rule_pos", rule_pos)
+        object.__setattr__(self, "start_offset", start_offset)
+        object.__setattr__(self, "key", key)
+    
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot assign to field {name!r}")
+    
+    def __delattr__(self, name: str) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot delete field {name!r}")
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, State):
+            return NotImplemented
         
-        return self.rule.rhs[self.rule_pos]
+        return self.key == other.key
+    
+    def __hash__(self) -> int:
+        return self.key
+    
+    def __repr__(self) -> str:
+        return f"State(rule={self.rule!r}, rule_pos={self.rule_pos!r}, start_offset={self.start_offset!r})"
+    
+    def get_next_item(self) -> BaseSymbol | None:
+        return self.rule.next_items[self.rule_pos]
     
     def shifted(self) -> State[T]:
-        if self.rule_pos == len(self.rule):
+        if self.rule.next_items[self.rule_pos] is None:
            raise ValueError("Cannot shift a completed state")
         
-        return dataclasses.replace(self, rule_pos=self.rule_pos + 1)
+        # rule_pos occupies the lowest bits of the key
+        return State(self.rule, self.rule_id, self.rule_pos + 1, self.start_offset, self.key + 1)
 
 
-class Table(UpdateableSet[State[T]], typing.Generic[T]):
+class Table(typing.Generic[T]):
+    """
+    An Earley set, with a built-in worklist: added states stay new until they are processed.
+    
+    States are stored as their packed integer keys (see `EarleyParserConfig.make_key`),
+    so no per-state objects are allocated, and shifting a state is just `key + 1`.
+    Since states are never removed, the worklist is just the tail
+    of the insertion-ordered list past the processed ones.
+    
+    Processed states are also indexed by their next item,
+    so that completion only has to look at the states actually waiting for the nonterminal,
+    and scanning only has to match each distinct terminal once.
+    
+    Nonterminals are referred to by their ids in the config.
+    """
+    
+    # All the states ever added, in the order they are processed
+    _states: typing.Final[typing.List[int]]
+    _keys: typing.Final[typing.Set[int]]
+    # The number of states at the front of `_states` that have been processed
+    _processed_cnt: int
+    _waiting: typing.Final[typing.Dict[int, typing.List[int]]]
+    _by_next_terminal: typing.Final[typing.Dict[Terminal[T], typing.List[int]]]
+    # Plain StrTerminals are bucketed by their value instead, so that a token finds its bucket with a single lookup
+    _by_next_str: typing.Final[typing.Dict[str, typing.List[int]]]
+    
+    def __init__(self, new_values: typing.Iterable[int] = ()):
+        self._states = []
+        self._keys = set()
+        self._processed_cnt = 0
+        self._waiting = {}
+        self._by_next_terminal = {}
+        self._by_next_str = {}
+        
+        self.add_many(new_values)
+    
     @staticmethod
-    def initial(start_rule: Rule[T]) -> Table:
-        return Table(new_values={State(start_rule)})
+    def initial(start_key: int) -> Table:
+        return Table(new_values=(start_key,))
+    
+    @property
+    def values(self) -> typing.Sequence[int]:
+        return self._states[:self._processed_cnt]
     
-    def is_successful(self, start_rule: Rule[T]) -> bool:
-        return any(
-            state.rule == start_rule and state.rule_pos == len(state.rule)
-            for state in self.values
-        )
+    @property
+    def new_values(self) -> typing.Sequence[int]:
+        return self._states[self._processed_cnt:]
+    
+    def add(self, key: int) -> None:
+        if key not in self._keys:
+            self._keys.add(key)
+            self._states.append(key)
+    
+    def add_many(self, keys: typing.Iterable[int]) -> None:
+        # Locals to speed up access
+        seen = self._keys
+        append = self._states.append
+        
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+                append(key)
+    
+    def has_new(self) -> bool:
+        return self._processed_cnt < len(self._states)
+    
+    def process(self) -> int:
+        key: int = self._states[self._processed_cnt]
+        self._processed_cnt += 1
+        return key
+    
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(self._states)
+    
+    def __len__(self) -> int:
+        return len(self._states)
+    
+    def is_successful(self, accepting_key: int) -> bool:
+        # A single key lookup instead of a scan for the completed start rule
+        return accepting_key in self._keys
+    
+    def add_waiting(self, nonterminal_id: int, key: int) -> None:
+        self._waiting.setdefault(nonterminal_id, []).append(key)
+    
+    def add_scannable(self, terminal: Terminal[T], key: int) -> None:
+        # Subclasses might override `matches`, so only exact StrTerminals are eligible
+        if type(terminal) is StrTerminal:
+            self._by_next_str.setdefault(terminal.value, []).append(key)
+        else:
+            self._by_next_terminal.setdefault(terminal, []).append(key)
+    
+    def get_waiting_for(self, nonterminal_id: int) -> typing.Sequence[int]:
+        """
+        Returns the processed states whose next item is the given nonterminal.
+        """
+        
+        return self._waiting.get(nonterminal_id, ())
+    
+    def get_matching(self, tok: T) -> typing.Generator[typing.List[int], None, None]:
+        """
+        Yields the groups of processed states that expect a terminal matching `tok`.
+        """
+        
+        if type(tok) is str:
+            # StrTerminal.matches is plain equality, and for strs that's what a dict lookup does
+            keys: typing.List[int] | None = self._by_next_str.get(tok)
+            
+            if keys is not None:
+                yield keys
+        else:
+            for value, keys in self._by_next_str.items():
+                if value == tok:
+                    yield keys
+        
+        for terminal, keys in self._by_next_terminal.items():
+            if terminal.matches(tok):
+                yield keys
 
 
 class EarleyParserConfig(typing.Generic[T]):
     start_rule: Rule[T]
-    rules_by_lhs: typing.Dict[Nonterminal, typing.List[Rule[T]]]
+    rules_by_lhs: typing.Mapping[Nonterminal, typing.Tuple[Rule[T], ...]]
+    # Rule ids are indices into this list
+    rules: typing.List[Rule[T]]
+    nonterminal_ids: typing.Dict[Nonterminal, int]
+    # The following are all indexed by ids, so that parsing doesn't have to hash any symbols
+    rule_ids_by_lhs_id: typing.List[typing.List[int]]
+    lhs_ids: typing.List[int]
+    # next_ids[rule id][rule_pos] is the id of the next nonterminal, or one of the special _NEXT_* values
+    next_ids: typing.List[typing.Tuple[int, ...]]
+    # The ids of the nonterminals that can derive an empty string
+    nullable_ids: typing.FrozenSet[int]
+    # The same data, flattened and indexed by the dotted rule, i.e. the low `_dot_bits` of a state key.
+    # Unused dotted rules past the end of a rule are filled with _NEXT_NONE
+    dot_next_ids: typing.List[int]
+    dot_next_terminals: typing.List[Terminal[T] | None]
+    dot_lhs_ids: typing.List[int]
+    # The dotted rules at the beginning of each of the nonterminal's rules
+    prediction_dots: typing.List[typing.Tuple[int, ...]]
+    # Bit widths of the rule_pos and rule id parts of state keys
+    _pos_bits: int
+    _rule_bits: int
+    _dot_bits: int
     
     def __init__(self, grammar: Grammar[T]):
         self.start_rule = only(grammar.get_rules_by_lhs(grammar.new_start))
-        self.rules_by_lhs = {}
+        self.rules_by_lhs = grammar.rules_by_lhs
+        self.rules = list(grammar.rules)
+        self.nonterminal_ids = {}
+        self.rule_ids_by_lhs_id = []
         
-        self._populate_rules_by_lhs(grammar)
+        self._populate_ids()
+        self._populate_nullable_ids(grammar)
+        
+        self._pos_bits = max(map(len, self.rules), default=0).bit_length()
+        self._rule_bits = len(self.rules).bit_length()
+        self._dot_bits = self._pos_bits + self._rule_bits
+        
+        self._populate_dots()
+    
+    def _get_nonterminal_id(self, nonterminal: Nonterminal) -> int:
+        nonterminal_id: int | None = self.nonterminal_ids.get(nonterminal)
+        
+        if nonterminal_id is None:
+            nonterminal_id = self.nonterminal_ids[nonterminal] = len(self.rule_ids_by_lhs_id)
+            self.rule_ids_by_lhs_id.append([])
+        
+        return nonterminal_id
+    
+    def _populate_ids(self):
+        self.lhs_ids = []
+        self.next_ids = []
+        
+        for rule_id, rule in enumerate(self.rules):
+            lhs_id: int = self._get_nonterminal_id(rule.lhs)
+            
+            self.lhs_ids.append(lhs_id)
+            self.rule_ids_by_lhs_id[lhs_id].append(rule_id)
+            
+            self.next_ids.append(tuple(
+                _NEXT_TERMINAL if symbol.is_terminal() else self._get_nonterminal_id(symbol)
+                for symbol in rule.rhs
+            ) + (_NEXT_NONE,))
+    
+    def _populate_nullable_ids(self, grammar: Grammar[T]):
+        # Every nullable nonterminal is the lhs of some rule, so it has an id by now
+        self.nullable_ids = frozenset(self.nonterminal_ids[nonterminal] for nonterminal in grammar.nullable)
+    
+    def _populate_dots(self):
+        dot_cnt: int = len(self.rules) << self._pos_bits
+        
+        self.dot_next_ids = [_NEXT_NONE] * dot_cnt
+        self.dot_next_terminals = [None] * dot_cnt
+        self.dot_lhs_ids = [_NEXT_NONE] * dot_cnt
+        
+        for rule_id, rule in enumerate(self.rules):
+            for rule_pos, next_id in enumerate(self.next_ids[rule_id]):
+                dot: int = self.make_key(rule_id, rule_pos)
+                
+                self.dot_next_ids[dot] = next_id
+                self.dot_lhs_ids[dot] = self.lhs_ids[rule_id]
+                
+                if next_id == _NEXT_TERMINAL:
+                    self.dot_next_terminals[dot] = rule.next_items[rule_pos]
+        
+        self.prediction_dots = [
+            tuple(self.make_key(rule_id) for rule_id in rule_ids)
+            for rule_ids in self.rule_ids_by_lhs_id
+        ]
     
-    def _populate_rules_by_lhs(self, grammar: Grammar[T]):
-        for rule in grammar.rules:
-            self.rules_by_lhs.setdefault(rule.lhs, []).append(rule)
+    def make_key(self, rule_id: int, rule_pos: int = 0, start_offset: int = 0) -> int:
+        """
+        Packs a state into its key.
+        
+        The key is laid out as start_offset | rule id | rule_pos, from the highest bits to the lowest.
+        start_offset is unbounded, and the other widths are fixed by the grammar.
+        """
+        
+        return (((start_offset << self._rule_bits) | rule_id) << self._pos_bits) | rule_pos
+    
+    def decode_state(self, key: int) -> State[T]:
+        """
+        The inverse of `make_key`, mostly useful for debugging.
+        """
+        
+        rule_pos: int = key & ((1 << self._pos_bits) - 1)
+        rule_id: int = (key >> self._pos_bits) & ((1 << self._rule_bits) - 1)
+        
+        return State(self.rules[rule_id], rule_id, rule_pos, key >> self._dot_bits, key)
+    
+    @cached_property
+    def start_key(self) -> int:
+        return self.make_key(self.rules.index(self.start_rule))
+    
+    @cached_property
+    def accepting_key(self) -> int:
+        """
+        The key of the completed start state, whose presence in the last table means the input is accepted.
+        """
+        
+        # rule_pos occupies the lowest bits of the key
+        return self.start_key + len(self.start_rule)
 
 
 class EarleyParser(Parser[bool, T], typing.Generic[T]):
@@ -74,7 +331,7 @@ class EarleyParser(Parser[bool, T], typing.Generic[T]):
         """
         
         self._source = source
-        self._tables = [Table.initial(self._config.start_rule)]
+        self._tables = [Table.initial(self._config.start_key)]
     
     def parse(self) -> bool:
         if not self._is_initialized():
@@ -85,7 +342,7 @@ class EarleyParser(Parser[bool, T], typing.Generic[T]):
         
         self._step(None)
         
-        result: bool = self._cur_table.is_successful(self._config.start_rule)
+        result: bool = self._cur_table.is_successful(self._config.accepting_key)
         
         self._uninitialize()
         
@@ -96,6 +353,8 @@ class EarleyParser(Parser[bool, T], typing.Generic[T]):
     
     def _uninitialize(self) -> None:
         del self._source
+        # The charts aren't needed past the result, so a reused parser doesn't keep them alive
+        del self._tables
     
     @property
     def _cur_table(self) -> Table[T]:
@@ -113,48 +372,78 @@ class EarleyParser(Parser[bool, T], typing.Generic[T]):
         self._tables.append(Table())
         
         table: typing.Final[Table[T]] = self._cur_table
-        last_table_size: int
+        tables: typing.Final[typing.List[Table[T]]] = self._tables
+        config: typing.Final[EarleyParserConfig[T]] = self._config
+        dot_bits: typing.Final[int] = config._dot_bits
+        dot_mask: typing.Final[int] = (1 << dot_bits) - 1
+        # The start_offset part of this table's predictions
+        cur_offset_bits: typing.Final[int] = self._cur_idx << dot_bits
+        
+        # Locals to speed up access, since this loop runs once per state.
+        # Prediction and completion are inlined here for the same reason
+        dot_next_ids = config.dot_next_ids
+        dot_next_terminals = config.dot_next_terminals
+        dot_lhs_ids = config.dot_lhs_ids
+        prediction_dots = config.prediction_dots
+        nullable_ids = config.nullable_ids
+        has_new = table.has_new
+        process = table.process
+        add = table.add
+        add_many = table.add_many
+        add_waiting = table.add_waiting
+        add_scannable = table.add_scannable
+        # The predictions for a nonterminal don't depend on the state that made them,
+        # so each nonterminal only has to be predicted once per table
+        predicted: typing.Set[int] = set()
+        # Likewise, completing a nonterminal only depends on its id and start_offset,
+        # so ambiguous derivations of the same span don't walk the origin table's bucket again
+        completed: typing.Set[typing.Tuple[int, int]] = set()
         
-        # Turns out, a failsafe like this is necessary here(...
-        while True:
-            last_table_size = len(table)
+        # No separate failsafe pass is needed for empty derivations: nullable nonterminals
+        # are known from the config, and states are shifted over them right away (Aycock & Horspool)
+        while has_new():
+            key: int = process()
+            dot: int = key & dot_mask
             
-            while table.has_new():
-                state: State = table.process()
+            next_id: int = dot_next_ids[dot]
+            
+            if next_id >= 0:
+                add_waiting(next_id, key)
                 
-                next_item: BaseSymbol | None = state.get_next_item()
+                if next_id not in predicted:
+                    predicted.add(next_id)
+                    add_many([cur_offset_bits | rule_dot for rule_dot in prediction_dots[next_id]])
                 
-                if next_item is None:
-                    self._complete(state)
-                elif next_item.is_terminal():
-                    self._scan(state, next_item, tok)
-                else:
-                    self._predict(next_item)
-            
-            if len(table) == last_table_size:
-                break
-            
-            table.refresh_all()
+                if next_id in nullable_ids:
+                    add(key + 1)
+            elif next_id == _NEXT_TERMINAL:
+                # States expecting terminals are scanned all at once, after the table is complete
+                add_scannable(dot_next_terminals[dot], key)
+            else:
+                completion: typing.Tuple[int, int] = (key >> dot_bits, dot_lhs_ids[dot])
+                
+                if completion in completed:
+                    continue
+                
+                completed.add(completion)
+                
+                # Only processed states are indexed in the origin table,
+                # so its bucket doesn't change while new states are added
+                add_many([
+                    prev_key + 1 for prev_key in tables[completion[0]].get_waiting_for(completion[1])
+                ])
+        
+        self._scan(tok)
     
-    def _scan(self, state: State, terminal: Terminal[T], tok: T | None) -> None:
+    def _scan(self, tok: T | None) -> None:
         if tok is None:
             return
         
-        if terminal.matches(tok):
-            self._next_table.add(state.shifted())
-    
-    def _predict(self, nonterminal: Nonterminal) -> None:
-        for rule in self._config.rules_by_lhs[nonterminal]:
-            self._cur_table.add(State(rule, start_offset=self._cur_idx))
-    
-    def _complete(self, state: State) -> None:
-        for prev_state in list(self._tables[state.start_offset]):
-            next_item: BaseSymbol | None = prev_state.get_next_item()
-            
-            if next_item != state.rule.lhs:
-                continue
-            
-            self._cur_table.add(prev_state.shifted())
+        next_table: Table[T] = self._next_table
+        
+        # rule_pos occupies the lowest bits of the key, so shifting a state is an increment
+        for keys in self._cur_table.get_matching(tok):
+            next_table.add_many([key + 1 for key in keys])
 
 
 class EarleyParserAPI(ParserAPI[bool, T], typing.Generic[T]):
@@ -4,6 +4,8 @@ import dataclasses
 import abc
 from functools import cached_property
 import itertools
+import operator
+import weakref
 
 from .utils import *
 
@@ -16,6 +18,8 @@ class BaseSymbol(abc.ABC):
     Base class for all symbols in a grammar
     """
     
+    __slots__ = ()
+    
     @abc.abstractmethod
     def is_terminal() -> bool:
         ...
@@ -28,6 +32,8 @@ class Terminal(BaseSymbol, typing.Generic[T]):
     Provided for extensibility.
     """
     
+    __slots__ = ()
+    
     def is_terminal(self) -> bool:
         return True
     
@@ -42,21 +48,88 @@ class Terminal(BaseSymbol, typing.Generic[T]):
         return self.value == token
 
 
-@dataclasses.dataclass(frozen=True, repr=False)
+@dataclasses.dataclass(frozen=True, repr=False, eq=False)
 class Nonterminal(BaseSymbol):
+    __slots__ = ("name", "_hash", "__weakref__")
+    
+    # Symbols are flyweights: there's a single live instance per class and name,
+    # so equality checks are mostly decided by identity alone. The table only holds
+    # weak references, so symbols are released along with the last grammar using them
+    _instances: typing.ClassVar[weakref.WeakValueDictionary[typing.Tuple[type, str], Nonterminal]] = weakref.WeakValueDictionary()
+    
     name: str
     
+    def __new__(cls, name: str):
+        instance: Nonterminal | None = cls._instances.get((cls, name))
+        
+        if instance is None:
+            instance = cls._instances.setdefault((cls, name), super().__new__(cls))
+        
+        return instance
+    
+    def __post_init__(self):
+        # Symbols are hashed a lot more often than they are created
+        object.__setattr__(self, "_hash", hash((self.name,)))
+    
+    def __reduce__(self):
+        # str hashes differ between processes, so the cached hash has to be recomputed on unpickling
+        return self.__class__, (self.name,)
+    
     def is_terminal(self) -> bool:
         return False
     
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        
+        return self.name == other.name
+    
+    def __hash__(self) -> int:
+        return self._hash
+    
     def __repr__(self):
         return self.name
 
 
-@dataclasses.dataclass(frozen=True, repr=False)
+@dataclasses.dataclass(frozen=True, repr=False, eq=False)
 class StrTerminal(Terminal[str]):
+    __slots__ = ("value", "_hash", "__weakref__")
+    
+    # Same as for Nonterminal
+    _instances: typing.ClassVar[weakref.WeakValueDictionary[typing.Tuple[type, str], StrTerminal]] = weakref.WeakValueDictionary()
+    
     value: str
     
+    def __new__(cls, value: str):
+        instance: StrTerminal | None = cls._instances.get((cls, value))
+        
+        if instance is None:
+            instance = cls._instances.setdefault((cls, value), super().__new__(cls))
+        
+        return instance
+    
+    def __post_init__(self):
+        # Same as for Nonterminal
+        object.__setattr__(self, "_hash", hash((self.value,)))
+    
+    def __reduce__(self):
+        return self.__class__, (self.value,)
+    
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        
+        return self.value == other.value
+    
+    def __hash__(self) -> int:
+        return self._hash
+    
     def get_token(self) -> str:
         return self.value
     
@@ -64,14 +137,55 @@ class StrTerminal(Terminal[str]):
         return repr(self.value)
 
 
-@dataclasses.dataclass(frozen=True, repr=False)
+# Not a dataclass, since most of the attributes are derived rather than fields. Keeping them out of the fields
+# would take `dataclasses.field` defaults, which clash with the hand-declared slots (`dataclass(slots=True)`
+# requires Python 3.10). So the constructor, equality, hash and immutability are all written out instead
 class Rule(typing.Generic[T]):
+    __slots__ = ("lhs", "rhs", "suffixes", "next_items", "next_is_terminal", "_hash")
+    
     lhs: Nonterminal
-    rhs: typing.Collection[BaseSymbol] = dataclasses.field(default_factory=tuple)
+    rhs: typing.Tuple[BaseSymbol, ...]
+    # The rest are derived from the above, and aren't compared
+    # suffixes[i] == rhs[i:], precomputed since parsers query these a lot
+    suffixes: typing.Tuple[typing.Tuple[BaseSymbol, ...], ...]
+    # next_items[i] is the symbol after position i, with None past the end
+    next_items: typing.Tuple[BaseSymbol | None, ...]
+    # next_is_terminal[i] tells whether next_items[i] is a terminal (False past the end)
+    next_is_terminal: typing.Tuple[bool, ...]
+    # Rules are hashed by every interned LR state lookup, so the hash is computed once
+    _hash: int
     
     def __init__(self, lhs: Nonterminal, rhs: typing.Collection[BaseSymbol] = ()):
+        rhs = tuple(rhs)
+        
         object.__setattr__(self, "lhs", lhs)
-        object.__setattr__(self, "rhs", tuple(rhs))
+        object.__setattr__(self, "rhs", rhs)
+        object.__setattr__(self, "suffixes", tuple(rhs[i:] for i in range(len(rhs) + 1)))
+        object.__setattr__(self, "next_items", rhs + (None,))
+        object.__setattr__(self, "next_is_terminal", tuple(symbol.is_terminal() for symbol in rhs) + (False,))
+        object.__setattr__(self, "_hash", hash((lhs, rhs)))
+    
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot assign to field {name!r}")
+    
+    def __delattr__(self, name: str) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot delete field {name!r}")
+    
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        
+        return self._hash == other._hash and self.lhs == other.lhs and self.rhs == other.rhs
+    
+    def __hash__(self) -> int:
+        return self._hash
+    
+    def __reduce__(self):
+        # The derived fields, including the hash, are recomputed on unpickling
+        return self.__class__, (self.lhs, self.rhs)
     
     def __len__(self):
         return len(self.rhs)
@@ -93,19 +207,36 @@ class Rule(typing.Generic[T]):
 
 
 class Grammar(typing.Generic[T]):
-    _rules: typing.Final[typing.Set[Rule[T]]]
+    # Used as an ordered set, so that rules are iterated in the order they were added
+    _rules: typing.Final[typing.Dict[Rule[T], None]]
     _nonterminals: typing.Final[typing.Dict[str, Nonterminal]]
     _start: typing.Final[str | Nonterminal]
+    # Dropped by `add_rule`, since they are derived from the rules
+    _CACHED_PROPERTIES: typing.ClassVar[typing.Tuple[str, ...]] = ("rules_by_lhs", "nullable")
     
     def __init__(self, rules: typing.Iterable[Rule[T]] = (), start: str | Nonterminal = "S"):
-        self._rules = set(rules)
+        self._rules = dict.fromkeys(rules)
         self._nonterminals = {rule.lhs.name: rule.lhs for rule in self._rules}
         
         self._start = start
     
+    def copy(self) -> Grammar[T]:
+        """
+        Returns a shallow copy: the rules and symbols are shared, but changes to either grammar don't affect the other.
+        """
+        
+        result: Grammar[T] = Grammar(self._rules, start=self._start)
+        result._nonterminals.update(self._nonterminals)
+        
+        # The new start can only be created once, so if it already exists, the copy already has its rule
+        if "new_start" in self.__dict__:
+            result.new_start = self.new_start
+        
+        return result
+    
     @property
     def rules(self) -> typing.Collection[Rule[T]]:
-        return self._rules
+        return self._rules.keys()
     
     @property
     def nonterminals(self) -> typing.Mapping[str, Nonterminal]:
@@ -127,9 +258,10 @@ class Grammar(typing.Generic[T]):
     
     def has_nonterminal(self, nonterm: str | Nonterminal) -> bool:
         if isinstance(nonterm, Nonterminal):
-            return nonterm in self.nonterminals.values()
+            # Looked up by name, rather than by scanning all the values
+            return self._nonterminals.get(nonterm.name) == nonterm
         
-        return nonterm in self.nonterminals.keys()
+        return nonterm in self._nonterminals
     
     def resolve_nonterminal(self, nonterm: str | Nonterminal) -> Nonterminal:
         if not self.has_nonterminal(nonterm):
@@ -148,27 +280,81 @@ class Grammar(typing.Generic[T]):
             raise KeyError(f"Duplicate nonterminal name: {nonterm.name}")
         
         self._nonterminals[nonterm.name] = nonterm
+        
+        return nonterm
 
     def ensure_nonterminal(self, nonterm: str | Nonterminal) -> Nonterminal:
+        """
+        Adds the nonterminal if it's missing. Returns the grammar's own instance of it.
+        """
+        
         if isinstance(nonterm, str):
             nonterm = Nonterminal(nonterm)
         
         if not self.has_nonterminal(nonterm):
-            self.add_nonterminal(nonterm)
+            return self.add_nonterminal(nonterm)
         
-        return nonterm
+        return self._nonterminals[nonterm.name]
     
     def add_rule(self, rule: Rule[T]) -> None:
-        for nonterm in rule.get_nonterminals():
-            self.ensure_nonterminal(nonterm)
+        # The rule is rebuilt from the interned nonterminals, unless it already uses them
+        lhs: Nonterminal = self.ensure_nonterminal(rule.lhs)
+        rhs: typing.Tuple[BaseSymbol, ...] = tuple(
+            symbol if symbol.is_terminal() else self.ensure_nonterminal(symbol)
+            for symbol in rule.rhs
+        )
+        
+        if lhs is not rule.lhs or any(map(operator.is_not, rhs, rule.rhs)):
+            rule = Rule(lhs, rhs)
         
-        self._rules.add(rule)
+        self._rules[rule] = None
+        
+        # Invalidate the cached indices
+        for name in self._CACHED_PROPERTIES:
+            self.__dict__.pop(name, None)
     
     def create_rule(self, lhs: str | Nonterminal, rhs: typing.Iterable[str | Nonterminal]) -> None:
         self.add_rule(Rule(lhs, tuple(rhs)))
     
+    @cached_property
+    def rules_by_lhs(self) -> typing.Dict[Nonterminal, typing.Tuple[Rule[T], ...]]:
+        """
+        The rules grouped by their lhs. Rebuilt after the grammar changes.
+        """
+        
+        result: typing.Dict[Nonterminal, typing.List[Rule[T]]] = {}
+        
+        for rule in self._rules:
+            result.setdefault(rule.lhs, []).append(rule)
+        
+        return {lhs: tuple(rules) for lhs, rules in result.items()}
+    
     def get_rules_by_lhs(self, lhs: Nonterminal) -> typing.Iterable[Rule[T]]:
-        return filter(lambda rule: rule.lhs == lhs, self._rules)
+        return self.rules_by_lhs.get(lhs, ())
+    
+    @cached_property
+    def nullable(self) -> typing.FrozenSet[Nonterminal]:
+        """
+        The nonterminals that can derive an empty string. Rebuilt after the grammar changes.
+        """
+        
+        result: typing.Set[Nonterminal] = set()
+        changed: bool = True
+        
+        # A plain fixed point, since grammars are small
+        while changed:
+            changed = False
+            
+            for rule in self._rules:
+                if rule.lhs in result:
+                    continue
+                
+                # Terminals are never nullable, and aren't in the set to begin with
+                if all(symbol in result for symbol in rule.rhs):
+                    result.add(rule.lhs)
+                    changed = True
+        
+        return frozenset(result)
     
     def prune(self) -> None:
         self._prune_unused_nonterminals()
@@ -177,11 +363,13 @@ class Grammar(typing.Generic[T]):
         # Trigger it here just to make sure it's already created
         self.new_start
         
-        used_nonterminals = set(rule.lhs for rule in self._rules)
-        used_nonterminals.add(self.new_start)  # It's considered used in any case
-        # used_nonterminals.add(self.start)  # Unnecessary, since it's always used by the new start rule
+        # Compared by name, since that's what `_nonterminals` is keyed by
+        used_names: typing.Set[str] = {rule.lhs.name for rule in self._rules}
+        used_names.add(self.new_start.name)  # It's considered used in any case
+        # used_names.add(self.start.name)  # Unnecessary, since it's always used by the new start rule
         
-        self._nonterminals -= used_nonterminals
+        for name in [name for name in self._nonterminals if name not in used_names]:
+            del self._nonterminals[name]
     
     # def get_all_terminals(self) -> typing.Set[Terminal[T]]:
     #     """
@@ -2,6 +2,8 @@ from __future__ import annotations
 import typing
 import dataclasses
 import itertools
+import os
+import pickle
 
 
 from .grammar import *
@@ -10,32 +12,159 @@ from .abstract_parser import *
 from .peekable_stream import *
 from .utils import *
 from ._lr_parser_helpers import *
+from ._lr_parser_helpers import _grammar_fingerprint
 
 
 T = typing.TypeVar("T", bound=Terminal)
 
 
+# Actions are dispatched on by their tags, which is cheaper than isinstance
+_SHIFT_TAG: typing.Final[int] = Action.shift._tag_
+_REDUCE_TAG: typing.Final[int] = Action.reduce._tag_
+_ACCEPT_TAG: typing.Final[int] = Action.accept._tag_
+_REDUCE_UNIT_TAG: typing.Final[int] = Action.reduce_unit._tag_
+
+
 # Could actually introduce a separate builder, but screw it
 class LRParserConfig(typing.Generic[T]):
     start_nonterm: Nonterminal
     eof_token: T
     k: int
+    lalr: bool
     root_table: LRState[T]
+    # Identifies the grammar and the build options the tables were built for
+    _fingerprint: str
+    # For k>1 only: lookaheads are packed into ints, `_token_bits` bits per token, the first one lowest.
+    # The EOF token gets id 0, so trimmed lookaheads pack the same as the padded ones
+    _token_ids: typing.Dict[T, int]
+    _unknown_token_id: int
+    _token_bits: int
     
-    def __init__(self, grammar: Grammar[T], eof_token: T, k: int = 1):
+    def __init__(self, grammar: Grammar[T], eof_token: T, k: int = 1,
+                 cache_dir: str | os.PathLike | None = None, lalr: bool = False):
         self.start_nonterm = grammar.new_start  # Also triggers its generation
         self.eof_token = eof_token
         self.k = k
+        self.lalr = lalr
+        self._fingerprint = _grammar_fingerprint(grammar, k, lalr)
+        
+        self.root_table = LRTablesBuilder(grammar, k, cache_dir=cache_dir, lalr=lalr).build()
+        
+        if k == 1:
+            self._build_token_actions()
+        else:
+            self._build_packed_actions()
+    
+    def _iter_states(self) -> typing.Iterator[LRState[T]]:
+        seen: typing.Set[int] = {id(self.root_table)}
+        # Doubles as the BFS queue, since it's never shrunk
+        order: typing.List[LRState[T]] = [self.root_table]
+        
+        for state in order:
+            yield state
+            
+            for transition in state.transitions.values():
+                if id(transition.target) not in seen:
+                    seen.add(id(transition.target))
+                    order.append(transition.target)
+    
+    def _build_token_actions(self) -> None:
+        """
+        Fills in `LRState.lookahead_actions` for every state for k=1, so that the parser doesn't need lookahead tuples.
+        """
         
-        self.root_table = LRTablesBuilder(grammar, k).build()
+        # Different states often share their actions dicts, so the rekeyed ones are shared as well
+        rekeyed: typing.Dict[int, typing.Dict[T, Action[T]]] = {}
+        
+        for state in self._iter_states():
+            token_actions: typing.Dict[T, Action[T]] | None = rekeyed.get(id(state.actions))
+            
+            if token_actions is None:
+                token_actions = rekeyed[id(state.actions)] = {
+                    (lookahead[0] if lookahead else self.eof_token): action
+                    for lookahead, action in state.actions.items()
+                }
+            
+            state.lookahead_actions = token_actions
+    
+    def _build_packed_actions(self) -> None:
+        """
+        Fills in `LRState.lookahead_actions` for every state for k>1, so that the parser hashes a single int
+        per action lookup, rather than a tuple of tokens.
+        """
+        
+        states: typing.List[LRState[T]] = list(self._iter_states())
+        
+        self._token_ids = {self.eof_token: 0}
+        
+        for state in states:
+            for lookahead in state.actions:
+                for token in lookahead:
+                    self._token_ids.setdefault(token, len(self._token_ids))
+        
+        # Tokens absent from the tables can't match any action, so they all share an id no key uses
+        self._unknown_token_id = len(self._token_ids)
+        self._token_bits = self._unknown_token_id.bit_length()
+        
+        # Same as in `_build_token_actions`
+        rekeyed: typing.Dict[int, typing.Dict[int, Action[T]]] = {}
+        
+        for state in states:
+            packed_actions: typing.Dict[int, Action[T]] | None = rekeyed.get(id(state.actions))
+            
+            if packed_actions is None:
+                packed_actions = rekeyed[id(state.actions)] = {
+                    self._pack_lookahead(lookahead): action
+                    for lookahead, action in state.actions.items()
+                }
+            
+            state.lookahead_actions = packed_actions
+    
+    def _pack_lookahead(self, lookahead: typing.Iterable[T]) -> int:
+        result: int = 0
+        
+        for i, token in enumerate(lookahead):
+            result |= self._token_ids.get(token, self._unknown_token_id) << (i * self._token_bits)
+        
+        return result
+    
+    def dump(self, path: str | os.PathLike) -> None:
+        """
+        Saves the built config to a file, so that `load` can restore it without rebuilding the tables.
+        """
+        
+        with open(path, "wb") as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @staticmethod
+    def load(path: str | os.PathLike, grammar: Grammar[T] | None = None) -> LRParserConfig[T]:
+        """
+        Restores a config saved by `dump`.
+        
+        If `grammar` is given, the config is checked to have been built for it, and a ValueError
+        is raised otherwise. The grammar itself is left untouched.
+        """
+        
+        with open(path, "rb") as file:
+            config = pickle.load(file)
+        
+        if not isinstance(config, LRParserConfig):
+            raise ValueError(f"Not an LR parser config: {path}")
+        
+        if grammar is not None:
+            # The config's own grammar had its new start generated, so a copy gets one as well
+            grammar = grammar.copy()
+            grammar.new_start
+            
+            if config._fingerprint != _grammar_fingerprint(grammar, config.k, config.lalr):
+                raise ValueError(f"The config at {path} was built for a different grammar")
+        
+        return config
 
 
 class LRParser(Parser[bool, T], typing.Generic[T]):
     _config: LRParserConfig[T]
     _source: PeekableStream[T]
-    # Could be a dataclass, but I'm too lazy for it at this point
-    # TODO: Don't actually need to store symbols here...
-    _stack: typing.List[typing.Tuple[BaseSymbol | T, LRState[T]]]
     
     
     def __init__(self, config: LRParserConfig[T]):
@@ -46,18 +175,23 @@ class LRParser(Parser[bool, T], typing.Generic[T]):
         Supply a source of text to parse. Note that it doesn't add to the existing source, it replaces it.
         """
         
-        self._source = PeekableStream(source, limit=self._config.k, sentinel=self._config.eof_token)
-        self._stack = [(self._config.start_nonterm, self._config.root_table)]
+        self._source = self._make_stream(source)
     
     def parse(self) -> bool:
         if not self._is_initialized():
             raise RuntimeError("Parser is not initialized")
         
-        result: bool = self._parse()
-        
+        source: PeekableStream[T] = self._source
         self._uninitialize()
         
-        return result
+        return self._run(source)
+    
+    def parse_once(self, source: typing.Iterable[T]) -> bool:
+        """
+        Same as `feed` followed by `parse`, but without keeping any state on the parser.
+        """
+        
+        return self._run(self._make_stream(source))
     
     def _is_initialized(self) -> bool:
         return hasattr(self, "_source")
@@ -65,48 +199,87 @@ class LRParser(Parser[bool, T], typing.Generic[T]):
     def _uninitialize(self) -> None:
         del self._source
     
-    @property
-    def _cur_state(self) -> LRState[T]:
-        return self._stack[-1][1]
+    def _make_stream(self, source: typing.Iterable[T]) -> PeekableStream[T]:
+        return PeekableStream(source, limit=self._config.k, sentinel=self._config.eof_token)
     
-    def _lookahead(self) -> typing.Tuple[T, ...]:
-        result: typing.List[T] = self._source.peek(self._config.k)
-        
-        while result and result[-1] == self._config.eof_token:
-            result.pop()
+    def _run(self, source: PeekableStream[T]) -> bool:
+        # Only the states are stored, since the parser never looks at the symbols
+        stack: typing.List[LRState[T]] = [self._config.root_table]
         
-        return tuple(result)
+        return self._parse(stack, source)
     
-    def _parse(self) -> bool:
-        # For faster access
-        stack: typing.List[typing.Tuple[BaseSymbol | T, LRState[T]]] = self._stack
+    def _parse(self, stack: typing.List[LRState[T]], source: PeekableStream[T]) -> bool:
+        """
+        Actions are looked up by a single key per lookahead, see `LRState.lookahead_actions`. For k=1 it's
+        just the next token, so there's nothing to build. For k>1 it's the lookahead packed into an int.
+        """
+        
+        config: LRParserConfig[T] = self._config
+        
+        # Locals to speed up access, since this loop runs once per action
+        push = stack.append
+        next_tok = source.next
+        peek_last = source.peek_last
+        packed: bool = config.k > 1
+        
+        # Only shifts advance the source, so the lookahead is kept across reductions.
+        # Each shift rolls a packed one by one token, instead of repacking it whole
+        preview: T | int
+        
+        if packed:
+            token_id = config._token_ids.get
+            unknown_token_id: int = config._unknown_token_id
+            token_bits: int = config._token_bits
+            # Where the newly visible token goes in the packed lookahead
+            last_shift: int = (config.k - 1) * token_bits
+            
+            preview = config._pack_lookahead(source.peek(config.k))
+        else:
+            preview = source.peek1()
         
         while stack:
-            cur_state: LRState[T] = self._cur_state
+            cur_state: LRState[T] = stack[-1]
             
-            preview: typing.Tuple[T, ...] = self._lookahead()
+            # A single hash lookup, rather than a membership test followed by indexing
+            action: Action[T] | None = cur_state.lookahead_actions.get(preview)
             
-            if preview not in cur_state.actions:
+            if action is None:
                 return False
             
-            action: Action[T] = cur_state.actions[preview]
+            tag: int = action._tag_
             
-            if isinstance(action, Action.accept):
-                return True
+            if tag == _SHIFT_TAG:
+                ch = next_tok()
+                push(cur_state.transitions[ch].target)
+                
+                if packed:
+                    preview = (preview >> token_bits) | (token_id(peek_last(), unknown_token_id) << last_shift)
+                else:
+                    preview = peek_last()
+                
+                continue
             
-            if isinstance(action, Action.shift):
-                ch = self._source.next()
-                stack.append((ch, cur_state.transitions[ch].target))
+            if tag == _REDUCE_UNIT_TAG:
+                rule: Rule[T] = action.value
+                
+                # Pop one and push one means just replacing the top
+                stack[-1] = stack[-2].transitions[rule.lhs].target
                 continue
             
-            assert isinstance(action, Action.reduce)
+            if tag == _ACCEPT_TAG:
+                return True
+            
+            assert tag == _REDUCE_TAG
             rule: Rule[T] = action.value
             
-            for i in range(len(rule)):
-                stack.pop()
+            # A single truncation instead of a pop per symbol. The guard is needed,
+            # since `del stack[-0:]` would clear the whole stack for an empty rule
+            rule_len: int = len(rule.rhs)
+            
+            if rule_len:
+                del stack[-rule_len:]
             
-            old_state: LRState[T] = self._cur_state
-            stack.append((rule.lhs, old_state.transitions[rule.lhs].target))
+            push(stack[-1].transitions[rule.lhs].target)
         
         assert False, "Shouldn't be reachable"
 
@@ -114,14 +287,19 @@ class LRParser(Parser[bool, T], typing.Generic[T]):
 class LRParserAPI(ParserAPI[bool, T], typing.Generic[T]):
     _config: LRParserConfig[T]
     
-    def __init__(self, grammar: Grammar[T], eof_token: T, k: int = 1):
-        self._config = LRParserConfig(grammar, eof_token, k)
+    def __init__(self, grammar: Grammar[T], eof_token: T, k: int = 1,
+                 cache_dir: str | os.PathLike | None = None, lalr: bool = False):
+        self._config = LRParserConfig(grammar, eof_token, k, cache_dir=cache_dir, lalr=lalr)
         
-        # debug(grammar)
-        # debug(self._config.root_table)
+        # if __debug__:
+        #     debug(grammar)
+        #     debug(self._config.root_table)
     
     def _get_parser(self) -> LRParser[T]:
         return LRParser(self._config)
+    
+    def parse(self, source: typing.Iterable[T]) -> bool:
+        return self._get_parser().parse_once(source)
 
 
 __all__ = [
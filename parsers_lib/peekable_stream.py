@@ -2,6 +2,8 @@ from __future__ import annotations
 import typing
 import itertools
 import io
+import re
+import functools
 from collections import deque
 from functools import wraps
 import dataclasses
@@ -40,6 +42,11 @@ class PeekableStream(typing.Generic[T]):
         return self._sentinel
     
     def _refill(self) -> None:
+        # The common case of advancing by a single element
+        if len(self._peeked) + 1 == self._limit:
+            self._peeked.append(next(self._source, self._sentinel))
+            return
+        
         self._peeked.extend(itertools.islice(self._source, self._limit - len(self._peeked)))
         
         if len(self._peeked) < self._limit:
@@ -63,10 +70,28 @@ class PeekableStream(typing.Generic[T]):
         if cnt > self._limit:
             raise ValueError("Cannot peek more than the limit")
         
+        # The buffer is always kept full, so peeking the whole of it needs no slicing
+        if cnt == self._limit:
+            return list(self._peeked)
+        
         return list(itertools.islice(self._peeked, cnt))
     
     def peek1(self) -> T:
-        return self.peek(1)[0]
+        if self._limit < 1:
+            raise ValueError("Cannot peek more than the limit")
+        
+        # The buffer is always kept full, so there's no need to slice it
+        return self._peeked[0]
+    
+    def peek_last(self) -> T:
+        """
+        Returns the farthest element within the limit, i.e. `peek(limit)[-1]` without building the list.
+        """
+        
+        if self._limit < 1:
+            raise ValueError("Cannot peek more than the limit")
+        
+        return self._peeked[-1]
     
     def __iter__(self) -> PeekableStreamIterator[T]:
         """
@@ -113,41 +138,230 @@ class PeekableStreamIterator(typing.Generic[T]):
         if self._exhausted:
             raise StopIteration()
         
+        # This runs once per character of tokenized input, so it
+        # uses the master's internals instead of its public methods
+        master: PeekableStream[T] = self._master
+        
         # The extra check is necessary in case some other iterator has overaken us
-        if self._last_pos == self._master.tell():
-            self._master.next()
+        if self._last_pos == master._pos:
+            master.next()
         
-        self._last_pos = self._master.tell()
+        self._last_pos = master._pos
         
-        if self._master.is_over():
+        value: T = master.peek1()
+        
+        if value is master._sentinel:
             # Meant to take effect next time
             self._exhausted = True
         
-        # print(f"peek >> {repr(self._master.peek1())}")
+        # print(f"peek >> {repr(value)}")
         
-        return self._master.peek1()
+        return value
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_stop_chars(stop_chars: str) -> typing.Pattern[str]:
+    return re.compile("[" + re.escape(stop_chars) + "]")
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_run(char_pattern: typing.Pattern[str]) -> typing.Pattern[str]:
+    return re.compile(f"(?:{char_pattern.pattern})*", char_pattern.flags)
 
 
 # TODO: Inherit from TextIOBase?
 class PeekableTextIO(PeekableStream[str]):
-    @staticmethod
-    def _iter_from_io(source: io.TextIOBase) -> typing.Generator[str, None, None]:
-        while True:
-            ch = source.read(1)
-            
-            if not ch:
-                break
-            
-            yield ch
+    # How much is read from the underlying source at once
+    _CHUNK_SIZE: typing.ClassVar[int] = 1 << 14
+    
+    _io: typing.Final[io.TextIOBase]
+    # The characters that have been read from the source, but haven't reached the peek buffer yet
+    _chunk: str
+    _chunk_pos: int
     
     def __init__(self, source: io.TextIOBase, limit: int, sentinel: str = ''):
-        super().__init__(self._iter_from_io(source), limit, sentinel)
+        self._io = source
+        self._chunk = ""
+        self._chunk_pos = 0
+        
+        # The characters are taken from the chunk directly, so there's no source iterator to speak of
+        super().__init__((), limit, sentinel)
+    
+    def _refill(self) -> None:
+        # Slices the chunk instead of pulling characters one by one through an iterator
+        peeked = self._peeked
+        chunk_pos: int = self._chunk_pos
+        
+        # The common case of advancing by a single char within the chunk
+        if len(peeked) + 1 == self._limit and chunk_pos < len(self._chunk):
+            peeked.append(self._chunk[chunk_pos])
+            self._chunk_pos = chunk_pos + 1
+            return
+        
+        while len(peeked) < self._limit:
+            if self._chunk_pos >= len(self._chunk):
+                self._chunk = self._io.read(self._CHUNK_SIZE)
+                self._chunk_pos = 0
+                
+                if not self._chunk:
+                    peeked.extend(itertools.repeat(self._sentinel, self._limit - len(peeked)))
+                    return
+            
+            end: int = min(len(self._chunk), self._chunk_pos + self._limit - len(peeked))
+            
+            peeked.extend(self._chunk[self._chunk_pos:end])
+            self._chunk_pos = end
 
     def peek_str(self, cnt: int) -> str:
         return ''.join(self.peek(cnt))
 
     def peek_ch(self) -> str:
         return self.peek1()
+    
+    def skip(self, cnt: int) -> None:
+        # Jumps over the chunk instead of advancing char by char
+        peeked = self._peeked
+        sentinel = self._sentinel
+        
+        while cnt > 0 and peeked and peeked[0] is not sentinel:
+            peeked.popleft()
+            self._pos += 1
+            cnt -= 1
+        
+        while cnt > 0 and not peeked:
+            if self._chunk_pos >= len(self._chunk):
+                self._chunk = self._io.read(self._CHUNK_SIZE)
+                self._chunk_pos = 0
+                
+                if not self._chunk:
+                    break
+            
+            step: int = min(cnt, len(self._chunk) - self._chunk_pos)
+            
+            self._chunk_pos += step
+            self._pos += step
+            cnt -= step
+        
+        self._refill()
+    
+    def lookahead(self, cnt: int) -> str:
+        """
+        Returns up to `cnt` upcoming characters without consuming them. Unlike `peek_str`, this isn't bound by the limit.
+        
+        Fewer characters are only returned at the end of the stream.
+        """
+        
+        peeked = self._peeked
+        
+        if self._sentinel in peeked:
+            # The end of the stream is already in sight
+            sentinel = self._sentinel
+            return "".join(itertools.takewhile(lambda ch: ch is not sentinel, peeked))[:cnt]
+        
+        result: str = "".join(peeked)
+        
+        need: int = cnt - len(result)
+        
+        while len(self._chunk) - self._chunk_pos < need:
+            more: str = self._io.read(self._CHUNK_SIZE)
+            
+            if not more:
+                break
+            
+            self._chunk = self._chunk[self._chunk_pos:] + more
+            self._chunk_pos = 0
+        
+        return result[:cnt] + self._chunk[self._chunk_pos:self._chunk_pos + max(need, 0)]
+    
+    def read_until(self, stop_chars: str) -> str:
+        """
+        Consumes the characters up to, but not including, the first one in `stop_chars` or the end of the stream.
+        
+        Returns the consumed characters. Long runs are found with a single C-level scan, instead of char by char.
+        """
+        
+        peeked = self._peeked
+        sentinel = self._sentinel
+        result: typing.List[str] = []
+        
+        # The peek buffer comes first
+        while peeked:
+            ch = peeked[0]
+            
+            if ch is sentinel or ch in stop_chars:
+                return "".join(result)
+            
+            result.append(peeked.popleft())
+            self._pos += 1
+        
+        stop_pattern = _compile_stop_chars(stop_chars)
+        
+        while True:
+            if self._chunk_pos >= len(self._chunk):
+                self._chunk = self._io.read(self._CHUNK_SIZE)
+                self._chunk_pos = 0
+                
+                if not self._chunk:
+                    break
+            
+            match = stop_pattern.search(self._chunk, self._chunk_pos)
+            end: int = match.start() if match is not None else len(self._chunk)
+            
+            result.append(self._chunk[self._chunk_pos:end])
+            self._pos += end - self._chunk_pos
+            self._chunk_pos = end
+            
+            if match is not None:
+                break
+        
+        self._refill()
+        
+        return "".join(result)
+    
+    def read_while(self, char_pattern: typing.Pattern[str]) -> str:
+        """
+        Consumes the longest run of characters that each match `char_pattern`, and returns it.
+        
+        The pattern should match exactly one character. The run is found by the regex engine, instead of char by char.
+        """
+        
+        peeked = self._peeked
+        sentinel = self._sentinel
+        result: typing.List[str] = []
+        
+        # The peek buffer comes first
+        while peeked:
+            ch = peeked[0]
+            
+            if ch is sentinel or char_pattern.fullmatch(ch) is None:
+                return "".join(result)
+            
+            result.append(peeked.popleft())
+            self._pos += 1
+        
+        run_pattern = _compile_run(char_pattern)
+        
+        while True:
+            if self._chunk_pos >= len(self._chunk):
+                self._chunk = self._io.read(self._CHUNK_SIZE)
+                self._chunk_pos = 0
+                
+                if not self._chunk:
+                    break
+            
+            # Always matches, possibly with an empty run
+            end: int = run_pattern.match(self._chunk, self._chunk_pos).end()
+            
+            result.append(self._chunk[self._chunk_pos:end])
+            self._pos += end - self._chunk_pos
+            self._chunk_pos = end
+            
+            if end < len(self._chunk):
+                break
+        
+        self._refill()
+        
+        return "".join(result)
 
 
 __all__ = [
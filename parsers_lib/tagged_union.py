@@ -37,6 +37,9 @@ def _is_classvar(value: typing.Any) -> bool:
 def tagged_union(cls: typing.Type) -> typing.Type:
     """
     Class decorator that creates a tagged union.
+    
+    Each member class gets a `_tag_` int, unique within the union, in declaration order.
+    Comparing tags is cheaper than `isinstance` checks in hot dispatch code.
     """
     
     assert issubclass(cls, object)
@@ -67,6 +70,7 @@ def tagged_union(cls: typing.Type) -> typing.Type:
         
         member_cls.__qualname__ = f"{cls.__qualname__}.{name}"
         member_cls.__module__ = cls.__module__
+        member_cls._tag_ = len(members)
         
         member_cls = dataclasses.dataclass(
             member_cls,
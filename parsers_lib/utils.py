@@ -2,13 +2,19 @@ from __future__ import annotations
 import typing
 # import functools
 import itertools
+import collections
 import dataclasses
+import logging
 
 
 T = typing.TypeVar("T")
 K = typing.TypeVar("K")
 
 
+# Distinguishes an exhausted iterator from any value it could yield
+_MISSING: typing.Final[object] = object()
+
+
 def only(iterable: typing.Iterable[T]) -> T:
     """
     Returns the only element of the iterable, or raises ValueError if there's more than one
@@ -16,17 +22,16 @@ def only(iterable: typing.Iterable[T]) -> T:
     
     iterator = iter(iterable)
     
-    try:
-        value = next(iterator)
-    except StopIteration:
+    # Defaults instead of catching StopIteration, which is a lot cheaper
+    value = next(iterator, _MISSING)
+    
+    if value is _MISSING:
         raise ValueError("Expected exactly one element, but got none")
     
-    try:
-        next(iterator)
-    except StopIteration:
-        return value
+    if next(iterator, _MISSING) is not _MISSING:
+        raise ValueError("Expected exactly one element, but got more")
     
-    raise ValueError("Expected exactly one element, but got more")
+    return value
 
 
 # def compare_iterables(*iterables: typing.Iterable[T]) -> bool:
@@ -34,11 +39,10 @@ def only(iterable: typing.Iterable[T]) -> T:
 #     Returns True if all iterables are equal, False otherwise
 #     """
     
-#     for values in itertools.zip_longest(*iterables, fillvalue=object()):
-#         if not all(value == values[0] for value in values[1:]):
-#             return False
+#     # List equality runs in C, and checks the lengths first
+#     lists = [value if isinstance(value, list) else list(value) for value in iterables]
     
-#     return True
+#     return all(lists[0] == other for other in lists[1:])
 
 
 # class VirtualMapping(typing.Generic[T, K], typing.Mapping[K, T]):
@@ -55,46 +59,96 @@ def only(iterable: typing.Iterable[T]) -> T:
 #         raise NotImplementedError("Virtual mappings have no determined length")
 
 
-@dataclasses.dataclass(frozen=True)
 class UpdateableSet(typing.Generic[T]):
-    values: typing.Set[T] = dataclasses.field(default_factory=set)
-    new_values: typing.Set[T] = dataclasses.field(default_factory=set)
+    """
+    A set with a built-in worklist: added values stay new until they are processed.
+    
+    New values are processed in FIFO order. Backed by dicts rather than sets,
+    so iteration follows the insertion order as well.
+    """
+    
+    _values: typing.Final[typing.Dict[T, None]]
+    _new_values: typing.Final[typing.Dict[T, None]]
+    # The new values in the order they should be processed
+    _queue: typing.Final[typing.Deque[T]]
+    
+    def __init__(self, new_values: typing.Iterable[T] = ()):
+        self._values = {}
+        self._new_values = dict.fromkeys(new_values)
+        self._queue = collections.deque(self._new_values)
+    
+    @property
+    def values(self) -> typing.KeysView[T]:
+        return self._values.keys()
+    
+    @property
+    def new_values(self) -> typing.KeysView[T]:
+        return self._new_values.keys()
     
     def add(self, value: T) -> None:
-        if value not in self.values:
-            self.new_values.add(value)
+        if value not in self._values and value not in self._new_values:
+            self._new_values[value] = None
+            self._queue.append(value)
+    
+    def add_many(self, values: typing.Iterable[T]) -> None:
+        processed = self._values
+        pending = self._new_values
+        
+        fresh = dict.fromkeys(value for value in values if value not in processed and value not in pending)
+        
+        pending.update(fresh)
+        self._queue.extend(fresh)
     
     def has_new(self) -> bool:
-        return bool(self.new_values)
+        return bool(self._queue)
     
     def process(self) -> T:
-        state = self.new_values.pop()
+        state = self._queue.popleft()
         
-        self.values.add(state)
+        del self._new_values[state]
+        self._values[state] = None
         
         return state
     
+    def process_all(self) -> None:
+        """
+        Marks all the new values as processed at once, for when they need no individual handling.
+        """
+        
+        self._values.update(self._new_values)
+        self._new_values.clear()
+        self._queue.clear()
+    
     def refresh_all(self) -> None:
-        self.new_values.update(self.values)
-        self.values.clear()
+        # The two are disjoint, so there are no duplicates to worry about
+        self._queue.extend(self._values)
+        self._new_values.update(self._values)
+        self._values.clear()
     
     def __iter__(self) -> typing.Iterator[T]:
-        return itertools.chain(self.values, self.new_values)
+        return itertools.chain(self._values, self._new_values)
     
     def __len__(self) -> int:
-        return len(self.values) + len(self.new_values)
+        return len(self._values) + len(self._new_values)
+
+
+# The library never writes to stdout by itself: debug output is only shown if the application enables it
+_logger: typing.Final[logging.Logger] = logging.getLogger(__package__)
 
 
 def debug(*args) -> None:
     """
     A convenience function to encapsulate debug printing.
     
-    Disabling is currently done by inserting a short-circuit `return` :)
+    The arguments are joined like `print` would, and logged to the library's logger at the DEBUG level,
+    so nothing is shown unless the application enables it, e.g. with `logging.basicConfig(level=logging.DEBUG)`.
+    Note that the arguments are still evaluated, so expensive call sites should be wrapped in `if __debug__:`
+    to be stripped entirely under `python -O`.
     """
     
-    # return
-    
-    print(*args, flush=True)
+    # Checked first, so that disabled calls don't format anything
+    if _logger.isEnabledFor(logging.DEBUG):
+        _logger.debug(" ".join(map(str, args)))
 
 
 __all__ = [
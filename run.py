@@ -5,15 +5,17 @@ import argparse
 from parsers_lib import all as parsers
 
 
-parser = argparse.ArgumentParser(
-    description="""
-    An interactive tool for some manual testing of the library.
-    """
-)
+def make_arg_parser() -> argparse.ArgumentParser:
+    # Only built when actually run, so that importing this module stays cheap
+    return argparse.ArgumentParser(
+        description="""
+        An interactive tool for some manual testing of the library.
+        """
+    )
 
 
 def main():
-    args = parser.parse_args()
+    args = make_arg_parser().parse_args()
     
     # print(list(parsers.BasicTokenizer(sample_grammar, parsers.BNFMetaParser._TOKENIZER_CONFIG).tokenize()))
     print(parsers.metaparse_bnf_grammar(path="grammars/sample.bnf"))
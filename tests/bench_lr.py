@@ -0,0 +1,63 @@
+from __future__ import annotations
+import typing
+import argparse
+import time
+
+import set_path
+from parsers_lib.all import *
+
+
+# The expression grammar the LR builder and parser optimizations were measured on
+EXPRESSIONS: typing.Final[str] = """
+    <start> ::= <expr>;
+    <expr> ::= <expr> "+" <term> | <expr> "-" <term> | <term>;
+    <term> ::= <term> "*" <factor> | <term> "/" <factor> | <factor>;
+    <factor> ::= "(" <expr> ")" | <num> | "-" <factor>;
+    <num> ::= <digit> <num> | <digit>;
+    <digit> ::= "0" | "1" | "2" | "3" | "4" | "5" | "6" | "7" | "8" | "9";
+"""
+
+SOURCE: typing.Final[str] = "(1+2)*3-45/(6-7)*" * 300 + "1"
+# Earley is much slower, so it only gets a prefix of the source
+EARLEY_SOURCE: typing.Final[str] = SOURCE[:400] + "1"
+
+
+def make_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="""
+        Times building and running the LR and Earley parsers on an expression grammar.
+        """
+    )
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 2], help="lookahead lengths to benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per measurement; the best one is reported")
+    return parser
+
+
+def best_time(func: typing.Callable[[], typing.Any], repeat: int) -> typing.Tuple[float, typing.Any]:
+    best: float = float("inf")
+    result: typing.Any = None
+    
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    
+    return best, result
+
+
+def main():
+    args = make_arg_parser().parse_args()
+    
+    for k in args.k:
+        # A fresh grammar per build, so that nothing is reused between runs
+        build_time, api = best_time(lambda: LRParserAPI(metaparse_bnf_grammar(data=EXPRESSIONS), "", k), args.repeat)
+        parse_time, ok = best_time(lambda: api.parse(CharTokenizer(SOURCE)), args.repeat)
+        print(f"LR({k}): build={build_time * 1000:.1f}ms parse={parse_time * 1000:.1f}ms ok={ok}")
+    
+    earley = EarleyParserAPI(metaparse_bnf_grammar(data=EXPRESSIONS))
+    earley_time, ok = best_time(lambda: earley.parse(CharTokenizer(EARLEY_SOURCE)), args.repeat)
+    print(f"Earley: parse={earley_time * 1000:.1f}ms ok={ok}")
+
+
+if __name__ == "__main__":
+    exit(main())
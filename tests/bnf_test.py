@@ -81,6 +81,23 @@ class BNFMetaParserTest(unittest.TestCase):
                 Rule(Nonterminal("start"), [StrTerminal("b")]),
             }, start=Nonterminal("start")
         ).split_long_terminals())
+    
+    def test_prune(self) -> None:
+        grammar = metaparse_bnf_grammar(data="<start> ::= <a> | <b>; <a> ::= 'a';")
+        
+        grammar.prune()
+        
+        self.assertEqual(set(grammar.nonterminals), {"start", "a", grammar.new_start.name})
+        self.assertFalse(grammar.has_nonterminal("b"))
+    
+    def test_nullable(self) -> None:
+        grammar = metaparse_bnf_grammar(data="<start> ::= <a> <b> | 'c'; <a> ::= <b> <b>; <b> ::= '' | 'b'; <d> ::= <d>;")
+        
+        self.assertEqual(grammar.nullable, {Nonterminal("start"), Nonterminal("a"), Nonterminal("b")})
+        
+        grammar.create_rule("d", [])
+        
+        self.assertIn(Nonterminal("d"), grammar.nullable)
 
 
 if __name__ == "__main__":
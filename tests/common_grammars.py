@@ -0,0 +1,38 @@
+from __future__ import annotations
+import typing
+
+
+# Grammar sources shared between several test cases. Keeping a single copy of each
+# also lets the grammar caches in parser_test_base hit across the test modules
+
+
+BRACKETS: typing.Final[str] = """ <start> ::= "(" <start> ")" | <start> <start> | ""; """
+
+EQUAL_AB: typing.Final[str] = """ <start> ::= "a" <start> "b" <start> | "b" <start> "a" <start> | ""; """
+
+RECURSIVE: typing.Final[str] = """ <start> ::= <a> | "abc"; <a> ::= <a>; """
+
+CRINGE: typing.Final[str] = """ <start> ::= <a> <start> <a> "abc" | ""; <a> ::= ""; <b> ::= ""; """
+
+# The example from the seminar
+SEMINAR: typing.Final[str] = """ <start> ::= <start> "a" <start> "b"; <start> ::= ''; """
+
+INDIRECT_RECURSION: typing.Final[str] = """
+    <start> ::= <A> "!";
+    <A> ::= "a" <B> | "";
+    <B> ::= "b" <A> | "";
+"""
+
+
+__all__ = [
+    "BRACKETS",
+    "EQUAL_AB",
+    "RECURSIVE",
+    "CRINGE",
+    "SEMINAR",
+    "INDIRECT_RECURSION",
+]
+
+
+if __name__ == "__main__":
+    assert False, "This file is not a unit test!"
@@ -1,8 +1,14 @@
 from __future__ import annotations
 import typing
 import unittest
+import tempfile
+import os
+import random
+import itertools
+import pickle
 
 import set_path
+import common_grammars
 from parser_test_base import *
 from parsers_lib.all import *
 import parsers_lib._lr_parser_helpers as lr_parser_helpers
@@ -13,10 +19,9 @@ class LR1ParserTest(ParserTestBase[LRParserAPI[StrTerminal]]):
     ParserAPIType: typing.ClassVar[typing.Type[LRParserAPI[StrTerminal]]] = LRParserAPI
     
     parsers: typing.ClassVar[typing.List[ParserTestInfo]] = [
-        # The example from the seminar
         ParserTestInfo(
             "seminar",
-            """ <start> ::= <start> "a" <start> "b"; <start> ::= ''; """,
+            common_grammars.SEMINAR,
             {
                 "aabb": True,
                 "ab":   True,
@@ -49,11 +54,7 @@ class LR1ParserTest(ParserTestBase[LRParserAPI[StrTerminal]]):
         # Proper indirect recursion test (should work with both LR(1) and LR(2))
         ParserTestInfo(
             "indirect_recursion",
-            """
-            <start> ::= <A> "!";
-            <A> ::= "a" <B> | "";
-            <B> ::= "b" <A> | "";
-            """,
+            common_grammars.INDIRECT_RECURSION,
             {
                 "!":       True,
                 "a!":      True,
@@ -71,23 +72,22 @@ class LR1ParserTest(ParserTestBase[LRParserAPI[StrTerminal]]):
         ),
     ]
     
+    K: typing.ClassVar[int] = 1
+    LALR: typing.ClassVar[bool] = False
+    
     @classmethod
     def build_parser(cls, grammar: Grammar | str) -> ParserAPIType:
-        if isinstance(grammar, str):
-            grammar = metaparse_bnf_grammar(data=grammar)
-        
-        return cls.ParserAPIType(grammar, "", 1)
+        return cls.ParserAPIType(coerce_grammar(grammar), "", cls.K, lalr=cls.LALR)
+    
+    @classmethod
+    def parser_cache_key(cls, grammar: Grammar) -> typing.Hashable:
+        return (super().parser_cache_key(grammar), cls.K, cls.LALR)
 
 
 class LR2ParserTest(LR1ParserTest):
     # Can't think of any unique test cases, but at least this does verify that LR(3) also works on LR(1) grammars...
     
-    @classmethod
-    def build_parser(cls, grammar: Grammar | str) -> LR1ParserTest.ParserAPIType:
-        if isinstance(grammar, str):
-            grammar = metaparse_bnf_grammar(data=grammar)
-        
-        return cls.ParserAPIType(grammar, "", 2)
+    K: typing.ClassVar[int] = 2
     
     parsers: typing.ClassVar[typing.List[ParserTestInfo]] = LR1ParserTest.parsers + [
         # LR(2), but not LR(1)
@@ -111,27 +111,28 @@ class LR2ParserTest(LR1ParserTest):
     ]
 
 
+class LALR1ParserTest(LR1ParserTest):
+    LALR: typing.ClassVar[bool] = True
+
+
 class FirstKTest(unittest.TestCase):
     K: typing.ClassVar[int] = 2
-    GRAMMAR_DEF: typing.ClassVar[str] = """ <start> ::= <start> "a" <start> "b"; <start> ::= ''; """
+    GRAMMAR_DEF: typing.ClassVar[str] = common_grammars.SEMINAR
     
     grammar: typing.ClassVar[Grammar]
-    first_k_provider: lr_parser_helpers.FirstKProvider
+    # Shared by the test methods, since queries only ever add to its caches
+    first_k_provider: typing.ClassVar[lr_parser_helpers.FirstKProvider]
     
     @classmethod
     def setUpClass(cls) -> None:
-        cls.grammar = metaparse_bnf_grammar(data=cls.GRAMMAR_DEF)
+        cls.grammar = parse_grammar(cls.GRAMMAR_DEF)
+        cls.first_k_provider = lr_parser_helpers.FirstKProvider(cls.grammar, cls.K)
     
     @classmethod
     def tearDownClass(cls) -> None:
+        del cls.first_k_provider
         del cls.grammar
     
-    def setUp(self) -> None:
-        self.first_k_provider = lr_parser_helpers.FirstKProvider(self.grammar, self.K)
-    
-    def tearDown(self) -> None:
-        del self.first_k_provider
-    
     def check_first_k(self,
                       rule_symbols: typing.Sequence[BaseSymbol],
                       continuation: str,
@@ -161,17 +162,195 @@ class FirstKTest(unittest.TestCase):
 # Could properly separate FirstKTest from the abstract base, but won't bother
 class ExtraFirstKTest1(FirstKTest):
     K: typing.Final[int] = 2
-    GRAMMAR_DEF: typing.ClassVar[str] = """
-        <start> ::= <A> "!";
-        <A> ::= "a" <B> | "";
-        <B> ::= "b" <A> | "";
-    """
+    GRAMMAR_DEF: typing.ClassVar[str] = common_grammars.INDIRECT_RECURSION
     
     def test_first_k(self) -> None:
         self.check_first_k([], "", {""})
         self.check_first_k([Nonterminal("A")], "", {"", "a", "ab"})
 
 
+class LALRDifferentialTest(unittest.TestCase):
+    """
+    Checks LALR(1) against canonical LR(1) and Earley on random small grammars.
+    """
+    
+    SEED: typing.ClassVar[int] = 2
+    GRAMMAR_CNT: typing.ClassVar[int] = 40
+    MAX_INPUT_LEN: typing.ClassVar[int] = 4
+    NONTERMINALS: typing.ClassVar[typing.Sequence[str]] = ("start", "A", "B")
+    ALPHABET: typing.ClassVar[str] = "abc"
+    
+    @classmethod
+    def random_grammar(cls, rng: random.Random) -> str:
+        rules: typing.List[str] = []
+        
+        for lhs in cls.NONTERMINALS:
+            for _ in range(rng.randint(1, 2)):
+                rhs: typing.List[str] = [
+                    f"<{rng.choice(cls.NONTERMINALS)}>" if rng.random() < 0.4 else f'"{rng.choice(cls.ALPHABET)}"'
+                    for _ in range(rng.randint(0, 3))
+                ]
+                
+                rules.append(f"<{lhs}> ::= {' '.join(rhs)};")
+        
+        return "\n".join(rules)
+    
+    def check_grammar(self, source: str) -> None:
+        # Separately parsed grammars, so that the builds share no objects but the symbols
+        try:
+            lr = LRParserAPI(metaparse_bnf_grammar(data=source), "", 1)
+        except lr_parser_helpers.LRConflict:
+            lr = None
+        
+        try:
+            lalr = LRParserAPI(metaparse_bnf_grammar(data=source), "", 1, lalr=True)
+        except lr_parser_helpers.LRConflict:
+            return  # Nothing to compare
+        
+        self.assertIsNotNone(lr, "LALR(1) should never succeed where LR(1) has conflicts")
+        
+        earley = EarleyParserAPI(metaparse_bnf_grammar(data=source))
+        
+        for length in range(self.MAX_INPUT_LEN + 1):
+            for data in map("".join, itertools.product(self.ALPHABET, repeat=length)):
+                expected: bool = earley.parse(CharTokenizer(data))
+                lr_result: bool = lr.parse(CharTokenizer(data))
+                lalr_result: bool = lalr.parse(CharTokenizer(data))
+                
+                # Subtests are only opened for the failures, like in ParserTestBase.check_all
+                if lr_result != expected or lalr_result != expected:
+                    with self.subTest(data=data):
+                        self.assertEqual(lr_result, expected, "LR(1)")
+                        self.assertEqual(lalr_result, expected, "LALR(1)")
+    
+    def test_separate_builds(self) -> None:
+        source: str = """
+            <start> ::= "c"; <start> ::= "a" <start> <A>;
+            <A> ::= "b"; <A> ::= "b";
+            <B> ::= <start> <B>; <B> ::= "b" "b";
+        """
+        
+        grammars: typing.List[Grammar[StrTerminal]] = []
+        states: typing.List[typing.Set[lr_parser_helpers.State[StrTerminal]]] = []
+        
+        for _ in range(2):
+            grammar: Grammar[StrTerminal] = metaparse_bnf_grammar(data=source)
+            _, tables = lr_parser_helpers.VGkBuilder(grammar, 1).build(lalr=True)
+            
+            grammars.append(grammar)
+            states.append({state for table in tables for state in table.values})
+        
+        # Equal grammars still get states of their own, built from their own rules
+        self.assertTrue(states[0].isdisjoint(states[1]))
+        
+        for grammar, grammar_states in zip(grammars, states):
+            rule_ids: typing.Set[int] = set(map(id, grammar.rules))
+            
+            self.assertTrue(all(id(state.rule) in rule_ids for state in grammar_states))
+    
+    def test_random(self) -> None:
+        rng = random.Random(self.SEED)
+        
+        for _ in range(self.GRAMMAR_CNT):
+            source: str = self.random_grammar(rng)
+            
+            with self.subTest(source=source):
+                self.check_grammar(source)
+
+
+class LRTablesCacheTest(unittest.TestCase):
+    GRAMMAR_DEF: typing.ClassVar[str] = common_grammars.SEMINAR
+    
+    def test_cache_roundtrip(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            built = LRParserAPI(metaparse_bnf_grammar(data=self.GRAMMAR_DEF), "", 1, cache_dir=cache_dir)
+            
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            # A separately parsed grammar, so it has to be matched by contents
+            loaded = LRParserAPI(metaparse_bnf_grammar(data=self.GRAMMAR_DEF), "", 1, cache_dir=cache_dir)
+            
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            for data in ("aabb", "ab", "ba", "", "aab"):
+                with self.subTest(data=data):
+                    self.assertEqual(loaded.parse(CharTokenizer(data)), built.parse(CharTokenizer(data)))
+    
+    def test_stale_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            LRParserAPI(parse_grammar(self.GRAMMAR_DEF), "", 1, cache_dir=cache_dir)
+            
+            (cache_name,) = os.listdir(cache_dir)
+            cache_path = os.path.join(cache_dir, cache_name)
+            
+            # Refers to a class that doesn't exist, like a cache from an older layout might.
+            # Unpickling it raises an AttributeError, rather than an UnpicklingError
+            with open(cache_path, "wb") as cache_file:
+                cache_file.write(b"cparsers_lib._lr_parser_helpers\nNoSuchClass\n.")
+            
+            rebuilt = LRParserAPI(parse_grammar(self.GRAMMAR_DEF), "", 1, cache_dir=cache_dir)
+            
+            self.assertTrue(rebuilt.parse(CharTokenizer("aabb")))
+            self.assertFalse(rebuilt.parse(CharTokenizer("aab")))
+            
+            # The stale cache is overwritten with a valid one
+            with open(cache_path, "rb") as cache_file:
+                self.assertIsInstance(pickle.load(cache_file), lr_parser_helpers.LRState)
+    
+    def test_config_dump_load(self) -> None:
+        config = LRParserConfig(metaparse_bnf_grammar(data=self.GRAMMAR_DEF), "", 1)
+        
+        with tempfile.TemporaryDirectory() as dump_dir:
+            path = os.path.join(dump_dir, "config.pkl")
+            config.dump(path)
+            
+            loaded = LRParserConfig.load(path, metaparse_bnf_grammar(data=self.GRAMMAR_DEF))
+            
+            for data in ("aabb", "ab", "ba", "", "aab"):
+                with self.subTest(data=data):
+                    parser = LRParser(loaded)
+                    parser.feed(CharTokenizer(data))
+                    
+                    reference = LRParser(config)
+                    reference.feed(CharTokenizer(data))
+                    
+                    self.assertEqual(parser.parse(), reference.parse())
+            
+            with self.assertRaises(ValueError):
+                LRParserConfig.load(path, metaparse_bnf_grammar(data=""" <start> ::= "a"; """))
+            
+            grammar = metaparse_bnf_grammar(data=self.GRAMMAR_DEF)
+            rules_cnt = len(grammar.rules)
+            
+            LRParserConfig(metaparse_bnf_grammar(data=self.GRAMMAR_DEF), "", 1, lalr=True).dump(path)
+            loaded = LRParserConfig.load(path, grammar)
+            
+            self.assertTrue(loaded.lalr)
+            self.assertEqual(len(grammar.rules), rules_cnt)
+            self.assertNotIn("new_start", grammar.__dict__)
+    
+    def test_deep_automaton(self) -> None:
+        # A chain of states much longer than the recursion limit
+        length: int = 3000
+        source: str = "<start> ::= " + " ".join(['"a"'] * length) + ";"
+        
+        with tempfile.TemporaryDirectory() as dump_dir:
+            path = os.path.join(dump_dir, "config.pkl")
+            
+            LRParserConfig(metaparse_bnf_grammar(data=source), "", 1).dump(path)
+            loaded = LRParserConfig.load(path)
+            
+            self.assertTrue(LRParser(loaded).parse_once(CharTokenizer("a" * length)))
+            self.assertFalse(LRParser(loaded).parse_once(CharTokenizer("a" * (length - 1))))
+            
+            LRParserAPI(metaparse_bnf_grammar(data=source), "", 1, cache_dir=dump_dir)
+            cached = LRParserAPI(metaparse_bnf_grammar(data=source), "", 1, cache_dir=dump_dir)
+            
+            # The cache was written, rather than the failure being swallowed
+            self.assertEqual(len([name for name in os.listdir(dump_dir) if name.startswith("lr_tables_")]), 1)
+            self.assertTrue(cached.parse(CharTokenizer("a" * length)))
+
+
 del ParserTestBase  # Otherwise it will be run as a test case
 
 
@@ -2,29 +2,75 @@ from __future__ import annotations
 import typing
 import unittest
 import dataclasses
+import functools
 
 import set_path
+import common_grammars
 from parsers_lib.all import *
 
 
 P = typing.TypeVar("P", bound=ParserAPI[bool, StrTerminal])
 
 
-@dataclasses.dataclass
+@functools.lru_cache(maxsize=None)
+def parse_grammar(source: str) -> Grammar:
+    """
+    Metaparses the grammar, reusing the result for the same source.
+    
+    The grammar is shared between all the parsers built from it, which is fine, since they don't modify it.
+    """
+    
+    return metaparse_bnf_grammar(data=source)
+
+
+def coerce_grammar(grammar: Grammar | str) -> Grammar:
+    """
+    The single entry point for turning test grammars into `Grammar`s. Sources are metaparsed through `parse_grammar`.
+    """
+    
+    if isinstance(grammar, str):
+        return parse_grammar(grammar)
+    
+    return grammar
+
+
+@functools.lru_cache(maxsize=None)
+def tokenize(data: str) -> typing.Tuple[str, ...]:
+    """
+    Tokenizes the test input, reusing the result for the same data. Fine, since `CharTokenizer` is pure.
+    """
+    
+    return tuple(CharTokenizer(data))
+
+
+@dataclasses.dataclass(frozen=True)
 class ParserTestInfo(typing.Generic[P]):
+    # Slots are declared by hand, since `dataclass(slots=True)` requires Python 3.10
+    __slots__ = ("name", "grammar", "tests")
+    
     name: str
     grammar: str
-    tests: typing.Dict[str, bool]
-    parser: P | None = None
+    # Written as dicts for readability, but stored as pairs, since they are only ever iterated over
+    tests: typing.Tuple[typing.Tuple[str, bool], ...]
+    
+    def __post_init__(self):
+        if isinstance(self.tests, typing.Mapping):
+            object.__setattr__(self, "tests", tuple(self.tests.items()))
 
 
 class ParserTestBase(unittest.TestCase, typing.Generic[P]):
     ParserAPIType: typing.ClassVar[typing.Type[P]] = ParserAPI
     
+    # The parsers built by `setUpClass`, by grammar source. Kept per class,
+    # since the `ParserTestInfo`s themselves are shared with the subclasses
+    _parsers: typing.ClassVar[typing.Dict[str, P]]
+    # Shared by all the subclasses, so that identical parsers are only built once
+    _parser_cache: typing.ClassVar[typing.Dict[typing.Hashable, ParserAPI[bool, StrTerminal]]] = {}
+    
     parsers: typing.ClassVar[typing.List[ParserTestInfo[P]]] = [
         ParserTestInfo(
             "brackets",
-            """ <start> ::= "(" <start> ")" | <start> <start> | ""; """,
+            common_grammars.BRACKETS,
             {
                 "":       True,
                 "()":     True,
@@ -42,7 +88,7 @@ class ParserTestBase(unittest.TestCase, typing.Generic[P]):
         
         ParserTestInfo(
             "equal_ab",
-            """ <start> ::= "a" <start> "b" <start> | "b" <start> "a" <start> | ""; """,
+            common_grammars.EQUAL_AB,
             {
                 "abab":  True,
                 "aabb":  True,
@@ -58,7 +104,7 @@ class ParserTestBase(unittest.TestCase, typing.Generic[P]):
         
         ParserTestInfo(
             "recursive",
-            """ <start> ::= <a> | "abc"; <a> ::= <a>; """,
+            common_grammars.RECURSIVE,
             {
                 "abc": True,
                 "a":   False,
@@ -68,7 +114,7 @@ class ParserTestBase(unittest.TestCase, typing.Generic[P]):
         
         ParserTestInfo(
             "cringe",
-            """ <start> ::= <a> <start> <a> "abc" | ""; <a> ::= ""; <b> ::= ""; """,
+            common_grammars.CRINGE,
             {
                 "":          True,
                 "abc":       True,
@@ -80,51 +126,100 @@ class ParserTestBase(unittest.TestCase, typing.Generic[P]):
         ),
     ]
     
+    # Rebuilt for every subclass. Reversed, so that the first of any duplicate names wins
+    _parsers_by_name: typing.ClassVar[typing.Dict[str, ParserTestInfo[P]]] = {info.name: info for info in reversed(parsers)}
+    
     @classmethod
     def get_parser_info(cls, name: str) -> ParserTestInfo:
-        for info in cls.parsers:
-            if info.name == name:
-                return info
+        info: ParserTestInfo | None = cls._parsers_by_name.get(name)
         
-        raise KeyError(f"Parser {name!r} not found")
+        if info is None:
+            raise KeyError(f"Parser {name!r} not found")
+        
+        return info
     
     @classmethod
     def build_parser(cls, grammar: Grammar | str) -> ParserAPIType:
-        if isinstance(grammar, str):
-            grammar = metaparse_bnf_grammar(data=grammar)
+        return cls.ParserAPIType(coerce_grammar(grammar))
+    
+    @classmethod
+    def parser_cache_key(cls, grammar: Grammar) -> typing.Hashable:
+        """
+        Identifies the parser `build_parser` makes. Override along with it, if it depends on more than the grammar.
+        
+        Grammars are compared by identity, which works since `coerce_grammar` reuses them for the same source.
+        """
+        
+        return (cls.ParserAPIType, grammar)
+    
+    @classmethod
+    def get_parser(cls, grammar: Grammar | str) -> ParserAPIType:
+        grammar = coerce_grammar(grammar)
+        key: typing.Hashable = cls.parser_cache_key(grammar)
+        
+        parser: P | None = cls._parser_cache.get(key)
+        
+        if parser is None:
+            parser = cls._parser_cache[key] = cls.build_parser(grammar)
+        
+        return parser
+    
+    @classmethod
+    def _make_test(cls, info: ParserTestInfo) -> typing.Callable[[ParserTestBase], None]:
+        def test(self: ParserTestBase) -> None:
+            self.check_all(info)
+        
+        # So that runners and tracebacks show the actual test name, rather than `<lambda>`
+        test.__name__ = f"test_{info.name}"
+        test.__qualname__ = f"{cls.__qualname__}.{test.__name__}"
         
-        return cls.ParserAPIType(grammar)
+        return test
     
     def __init_subclass__(cls) -> None:
         super().__init_subclass__()
         
         for info in cls.parsers:
-            setattr(cls, f"test_{info.name}", lambda self, info=info: self.check_all(info))
+            setattr(cls, f"test_{info.name}", cls._make_test(info))
+        
+        cls._parsers_by_name = {info.name: info for info in reversed(cls.parsers)}
     
     @classmethod
     def setUpClass(cls) -> None:
         assert cls is not ParserTestBase, "ParserTestBase is an abstract base class, not a test case"
         
-        for info in cls.parsers:
-            info.parser = cls.build_parser(info.grammar)
+        cls._parsers = {info.grammar: cls.get_parser(info.grammar) for info in cls.parsers}
     
     @classmethod
     def tearDownClass(cls) -> None:
-        for info in cls.parsers:
-            info.parser = None
+        del cls._parsers
     
     def check(self, parser: ParserAPIType, data: str, expected: bool) -> None:
         with self.subTest(data=data):
-            actual = parser.parse(CharTokenizer(data))
+            actual = parser.parse(tokenize(data))
             
             self.assertEqual(actual, expected)
     
     def check_all(self, info: ParserTestInfo) -> None:
-        for data, expected in info.tests.items():
-            self.check(info.parser, data, expected)
+        parse = self._parsers[info.grammar].parse
+        
+        # Subtests are only opened for the failures, since all of the inputs usually pass
+        failures: typing.List[typing.Tuple[str, bool, bool]] = []
+        
+        for data, expected in info.tests:
+            actual: bool = parse(tokenize(data))
+            
+            if actual != expected:
+                failures.append((data, expected, actual))
+        
+        for data, expected, actual in failures:
+            with self.subTest(data=data):
+                self.assertEqual(actual, expected)
 
 
 __all__ = [
+    "parse_grammar",
+    "coerce_grammar",
+    "tokenize",
     "ParserTestInfo",
     "ParserTestBase",
 ]